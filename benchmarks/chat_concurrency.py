@@ -0,0 +1,82 @@
+"""Measure how many concurrent /chat/ask requests a single API worker sustains
+
+Start one worker with rate limiting disabled, then run this script at a few
+concurrency levels on the commit you want to compare:
+
+    RATE_LIMIT_ENABLED=False ANSWER_CACHE_ENABLED=False uvicorn src.main:app --workers 1
+    python -m benchmarks.chat_concurrency --concurrency 1 8 32 64
+
+With a blocking request path, throughput stays flat as concurrency grows and
+latency grows linearly. With the async path it scales until the upstream
+model or the executor is saturated.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Dict
+
+import httpx
+
+from benchmarks.stats import percentile
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, requests: int, question: str) -> Dict:
+    """Send `requests` questions with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/api/v1/chat/ask", json={"question": f"{question} ({i})", "top_k": 3}
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_mean_s": round(statistics.mean(latencies), 3) if latencies else None,
+        "latency_p95_s": round(percentile(latencies, 95), 3) if latencies else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY", ""))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-per-level", type=int, default=64)
+    parser.add_argument("--question", default="What is the main topic?")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(
+        base_url=args.base_url, headers={"X-API-Key": args.api_key}, timeout=300
+    ) as client:
+        results = []
+        for concurrency in args.concurrency:
+            result = await run_level(client, concurrency, args.requests_per_level, args.question)
+            results.append(result)
+            print(json.dumps(result))
+
+    return results
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+"""Local stand-in for the OpenAI embeddings and chat-completions APIs
+
+Serves deterministic embeddings and canned answers with configurable
+latency and token rate, so the app can be load-tested without network
+access or API spend:
+
+    python -m benchmarks.fake_openai --port 9100 --latency-ms 50 --tokens-per-second 60
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import uuid
+from typing import List, Union
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class FakeOpenAIConfig:
+    """Latency and size knobs for the fake server"""
+
+    def __init__(self, latency_ms: float = 50.0, embedding_latency_ms: float = 20.0,
+                 tokens_per_second: float = 50.0, answer_tokens: int = 60, dimension: int = 1536):
+        self.latency_ms = latency_ms
+        self.embedding_latency_ms = embedding_latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.dimension = dimension
+
+
+def fake_vector(text: str, dimension: int) -> np.ndarray:
+    """Deterministic unit vector for a text"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_app(config: FakeOpenAIConfig) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    answer_words = [f"word{i}" for i in range(config.answer_tokens)]
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs: Union[str, List] = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+
+        await asyncio.sleep(config.embedding_latency_ms / 1000)
+
+        data = []
+        for index, item in enumerate(inputs):
+            vector = fake_vector(json.dumps(item), config.dimension)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+
+        tokens = sum(len(item) if isinstance(item, list) else len(item.split()) for item in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "fake-chat")
+        token_delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+        await asyncio.sleep(config.latency_ms / 1000)
+
+        if body.get("stream"):
+            async def stream():
+                for i, word in enumerate(answer_words):
+                    await asyncio.sleep(token_delay)
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"role": "assistant", "content": ("" if i == 0 else " ") + word},
+                            "finish_reason": None,
+                        }],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+
+                done = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        await asyncio.sleep(token_delay * len(answer_words))
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(answer_words)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(answer_words),
+                "total_tokens": prompt_tokens + len(answer_words),
+            },
+        })
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Chat completion time to first token")
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(
+        latency_ms=args.latency_ms,
+        embedding_latency_ms=args.embedding_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        dimension=args.dimension,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
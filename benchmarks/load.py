@@ -0,0 +1,252 @@
+"""End-to-end load and latency benchmark
+
+Starts the fake OpenAI server and the API (SQLite database unless
+--database-url is given, scratch directories) as subprocesses, then drives
+/documents/upload, /chat/ask and /chat/history at the requested concurrency.
+Writes throughput and p50/p95/p99 per stage to a JSON file (in the scratch
+directory unless --output is given) that can be compared across commits:
+
+    python -m benchmarks.load --concurrency 16 --output benchmarks/results/head.json
+    python -m benchmarks.load --concurrency 16 --compare benchmarks/results/head.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.stats import summarize
+
+API_KEY = "benchmark-key"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_SENTENCES = [
+    "Base salary is reviewed every year in March.",
+    "Employees receive fifteen days of paid vacation.",
+    "Part number A-1042 must be inspected before shipment.",
+    "Clause 4.2.1 covers termination for convenience.",
+    "The warranty period is twenty four months from delivery.",
+    "Expense reports are due within thirty days of travel.",
+]
+
+
+def make_document(index: int, paragraphs: int) -> bytes:
+    """Generate a text document with some repeated boilerplate"""
+    lines = [f"Benchmark document {index}"]
+    for p in range(paragraphs):
+        lines.append(" ".join(SAMPLE_SENTENCES[(index + p + i) % len(SAMPLE_SENTENCES)] for i in range(8)))
+        lines.append(f"Section {p} of document {index} references item {index * 100 + p}.")
+    return "\n\n".join(lines).encode("utf-8")
+
+
+def start_process(args: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(args, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_until_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+async def run_stage(count: int, concurrency: int, request: Callable) -> Dict:
+    """Run `count` calls of `request(i)` with bounded concurrency and summarize latencies
+
+    Failed calls are counted as errors; a timeout aborts the run, since the
+    remaining latencies would be meaningless.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await request(i)
+                latencies.append(time.perf_counter() - start)
+            except TimeoutError:
+                raise
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def wait_for_job(client: httpx.AsyncClient, job: Dict, timeout: float, poll_interval: float = 0.1):
+    job_id = job["id"]
+    deadline = time.monotonic() + timeout
+    while job["status"] not in ("completed", "failed"):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Job {job_id} still {job['status']} after {timeout}s (progress: {job.get('progress')})")
+        await asyncio.sleep(poll_interval)
+        response = await client.get(f"/api/v1/documents/jobs/{job_id}")
+        response.raise_for_status()
+        job = response.json()
+    if job["status"] == "failed":
+        raise RuntimeError(job.get("error"))
+
+
+async def drive(base_url: str, args) -> Dict[str, Dict]:
+    stages = {}
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, headers={"X-API-Key": API_KEY}, timeout=300, limits=limits
+    ) as client:
+
+        async def upload(i: int):
+            response = await client.post(
+                "/api/v1/documents/upload",
+                files={"file": (f"bench-{i}.txt", make_document(i, args.paragraphs), "text/plain")},
+                data={"title": f"Benchmark {i}"},
+            )
+            response.raise_for_status()
+            return response.json()
+
+        async def upload_and_index(i: int):
+            body = await upload(i)
+            if "job" in body:
+                await wait_for_job(client, body["job"], timeout=args.job_timeout)
+
+        async def ask(i: int):
+            question = f"What does clause {i % 7}.2.1 say about item {i}?"
+            response = await client.post(
+                "/api/v1/chat/ask", json={"question": question, "top_k": args.top_k}
+            )
+            response.raise_for_status()
+
+        async def history(i: int):
+            response = await client.get("/api/v1/chat/history", params={"limit": 50})
+            response.raise_for_status()
+
+        stages["upload"] = await run_stage(args.documents, args.concurrency, upload_and_index)
+        stages["chat_ask"] = await run_stage(args.questions, args.concurrency, ask)
+        stages["chat_history"] = await run_stage(args.history_requests, args.concurrency, history)
+
+    return stages
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\nCompared with {baseline_path} ({baseline.get('commit')}):")
+    for stage, metrics in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        for key in ("throughput_rps", "p50_s", "p95_s", "p99_s"):
+            old, new = before.get(key), metrics.get(key)
+            if old and new is not None:
+                print(f"  {stage:14} {key:15} {old:>10} -> {new:<10} ({(new - old) / old * 100:+.1f}%)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--history-requests", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--api-port", type=int, default=9000)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the answer cache enabled")
+    parser.add_argument("--database-url", default=None, help="Database for the API (default: SQLite in the scratch directory)")
+    parser.add_argument("--job-timeout", type=float, default=300.0, help="Seconds an ingestion job may take before the run fails")
+    parser.add_argument("--output", default=None, help="JSON result path (default: <scratch directory>/results.json)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "API_KEY": API_KEY,
+        "DEBUG": "False",
+        "RATE_LIMIT_ENABLED": "False",
+        "ANSWER_CACHE_ENABLED": str(args.answer_cache),
+        "CHROMA_PERSIST_DIR": os.path.join(workdir, "chroma_db"),
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache", "embeddings.sqlite3"),
+        "KEYWORD_INDEX_PATH": os.path.join(workdir, "keyword_index", "bm25.json"),
+        "FLAT_INDEX_DIR": os.path.join(workdir, "flat_index"),
+    })
+
+    fake = start_process([
+        sys.executable, "-m", "benchmarks.fake_openai", "--port", str(args.fake_port),
+        "--latency-ms", str(args.latency_ms), "--embedding-latency-ms", str(args.embedding_latency_ms),
+        "--tokens-per-second", str(args.tokens_per_second), "--answer-tokens", str(args.answer_tokens),
+    ], env, os.path.join(workdir, "fake_openai.log"))
+    api = start_process([
+        sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(args.api_port), "--workers", "1",
+        "--log-level", "warning",
+    ], env, os.path.join(workdir, "api.log"))
+
+    try:
+        await wait_until_ready(f"http://127.0.0.1:{args.fake_port}/docs")
+        await wait_until_ready(f"http://127.0.0.1:{args.api_port}/health")
+        stages = await drive(f"http://127.0.0.1:{args.api_port}", args)
+    except TimeoutError:
+        print(f"Benchmark aborted, see the API log in {workdir}", file=sys.stderr)
+        raise
+    finally:
+        api.terminate()
+        fake.terminate()
+        api.wait(timeout=30)
+        fake.wait(timeout=30)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "stages": stages,
+    }
+
+    output = args.output or os.path.join(workdir, "results.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(json.dumps(stages, indent=2))
+    print(f"\nResults written to {output} (logs in {workdir})")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
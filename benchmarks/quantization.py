@@ -0,0 +1,136 @@
+"""Recall-vs-memory report for the flat index quantization modes
+
+Indexes a sample corpus with float32, float16 and int8 first passes, then
+for each rescore multiplier reports recall@k and top-1 agreement against
+exact float32 search, query latency, the bytes per vector the first pass
+scans (what must stay resident for fast queries) and the bytes on disk.
+Held-out corpus vectors are used as queries.
+
+The sample is synthetic by default; pass a Chroma directory to sample real
+embeddings, or a .npy matrix:
+
+    python -m benchmarks.quantization --chroma-dir ./chroma_db --sample 50000
+    python -m benchmarks.quantization --vectors 100000 --dimension 1536 --output benchmarks/results/quantization.json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.stats import percentile
+from benchmarks.vector_index import make_corpus
+from src.vector_store.flat_index import FlatIndex, QUANTIZATIONS
+
+
+def load_sample(args) -> np.ndarray:
+    if args.embeddings:
+        return np.load(args.embeddings).astype(np.float32)
+
+    if args.chroma_dir:
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        client = chromadb.PersistentClient(path=args.chroma_dir, settings=ChromaSettings(anonymized_telemetry=False))
+        collection = client.get_collection(args.collection)
+        batches = []
+        for offset in range(0, min(args.sample, collection.count()), 5000):
+            results = collection.get(limit=min(5000, args.sample - offset), offset=offset, include=["embeddings"])
+            batches.append(np.asarray(results["embeddings"], dtype=np.float32))
+        return np.concatenate(batches)
+
+    _, vectors, _ = make_corpus(args.vectors // args.chunks, args.chunks, args.dimension, args.seed)
+    return vectors
+
+
+def directory_bytes(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chroma-dir", default=None, help="Sample embeddings from this Chroma directory")
+    parser.add_argument("--collection", default="documents")
+    parser.add_argument("--embeddings", default=None, help="Sample embeddings from a .npy matrix")
+    parser.add_argument("--sample", type=int, default=50000, help="Vectors read from Chroma")
+    parser.add_argument("--vectors", type=int, default=50000, help="Synthetic corpus size")
+    parser.add_argument("--chunks", type=int, default=50, help="Synthetic chunks per document")
+    parser.add_argument("--dimension", type=int, default=1536, help="Synthetic dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--multipliers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    vectors = load_sample(args)
+    rng = np.random.default_rng(args.seed)
+    held_out = rng.choice(len(vectors), size=min(args.queries, len(vectors) // 10), replace=False)
+    queries = vectors[held_out]
+    corpus = np.delete(vectors, held_out, axis=0)
+    ids = [str(row) for row in range(len(corpus))]
+
+    norms = np.einsum("ij,ij->i", corpus, corpus)
+    expected: List[List[str]] = []
+    for query in queries:
+        distances = norms - 2.0 * (corpus @ query)
+        expected.append([ids[row] for row in np.argsort(distances)[:args.top_k]])
+
+    workdir = tempfile.mkdtemp(prefix="quantization-bench-")
+    report: List[Dict] = []
+    try:
+        for quantization in QUANTIZATIONS:
+            directory = os.path.join(workdir, quantization)
+            index = FlatIndex(directory, quantization=quantization, save_interval=3600)
+            for start in range(0, len(corpus), 4096):
+                index.add(ids[start:start + 4096], corpus[start:start + 4096], [""] * len(ids[start:start + 4096]))
+            index.save()
+            scan_bytes = index.scan_bytes_per_vector()
+
+            for multiplier in (args.multipliers if quantization != "none" else [1]):
+                index.rescore_multiplier = multiplier
+                latencies = []
+                hits = top1 = 0
+                for query, truth in zip(queries, expected):
+                    start = time.perf_counter()
+                    result = [chunk_id for chunk_id, _ in index.search(query, args.top_k)]
+                    latencies.append(time.perf_counter() - start)
+                    hits += len(set(result) & set(truth))
+                    top1 += bool(result) and result[0] == truth[0]
+
+                report.append({
+                    "quantization": quantization,
+                    "rescore_multiplier": multiplier if quantization != "none" else None,
+                    f"recall@{args.top_k}": round(hits / (args.top_k * len(queries)), 4),
+                    "top1_agreement": round(top1 / len(queries), 4),
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                    "scan_bytes_per_vector": scan_bytes,
+                    "scan_mb": round(scan_bytes * len(corpus) / 2**20, 1),
+                    "disk_mb": round(directory_bytes(directory) / 2**20, 1),
+                })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = report[0]["scan_bytes_per_vector"]
+    print(f"{len(corpus)} vectors, dimension {corpus.shape[1]}, {len(queries)} held-out queries\n")
+    print(f"{'mode':8} {'mult':>4} {'recall':>7} {'top1':>6} {'p50 ms':>8} {'p95 ms':>8} {'scan MB':>8} {'density':>8} {'disk MB':>8}")
+    for row in report:
+        print(
+            f"{row['quantization']:8} {row['rescore_multiplier'] or '-':>4} {row[f'recall@{args.top_k}']:>7} "
+            f"{row['top1_agreement']:>6} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['scan_mb']:>8} "
+            f"{baseline / row['scan_bytes_per_vector']:>7.2f}x {row['disk_mb']:>8}"
+        )
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "vectors": len(corpus), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Latency summaries shared by the benchmark scripts"""
+import statistics
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Throughput and latency percentiles (seconds) for one stage"""
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_s": round(statistics.mean(latencies), 4) if latencies else None,
+        "p50_s": round(percentile(latencies, 50), 4) if latencies else None,
+        "p95_s": round(percentile(latencies, 95), 4) if latencies else None,
+        "p99_s": round(percentile(latencies, 99), 4) if latencies else None,
+    }
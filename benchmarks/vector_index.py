@@ -0,0 +1,163 @@
+"""Compare Chroma (HNSW) with the flat memory-mapped index on filtered and unfiltered queries
+
+Builds both indexes in a scratch directory from synthetic unit vectors
+(documents with a fixed number of chunks each, inserted in batches that
+complete out of order the way concurrent embedding batches do), then times
+single queries without a filter and with filters of a few document ids.
+Recall is measured against exact brute-force search:
+
+    python -m benchmarks.vector_index --documents 2000 --chunks 50 --dimension 384
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.stats import percentile
+from src.vector_store.flat_index import FlatIndex
+
+
+def make_corpus(documents: int, chunks: int, dimension: int, seed: int):
+    """Unit vectors clustered per document, so filtered and unfiltered neighbours differ"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((documents, dimension)).astype(np.float32)
+    vectors = np.repeat(centers, chunks, axis=0) + rng.standard_normal((documents * chunks, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    document_ids = [f"doc-{i}" for i in range(documents) for _ in range(chunks)]
+    ids = [f"{document_id}-{i % chunks}" for i, document_id in enumerate(document_ids)]
+    return ids, vectors, document_ids
+
+
+def insertion_order(count: int, batch: int, concurrency: int, seed: int) -> List[int]:
+    """Rows in document order, in batches that complete out of order within windows of `concurrency`"""
+    rng = np.random.default_rng(seed)
+    batches = [np.arange(start, min(count, start + batch)) for start in range(0, count, batch)]
+    for start in range(0, len(batches), concurrency):
+        window = batches[start:start + concurrency]
+        rng.shuffle(window)
+        batches[start:start + concurrency] = window
+    return list(np.concatenate(batches))
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[int]:
+    candidates = np.arange(len(vectors)) if rows is None else rows
+    distances = ((vectors[candidates] - query) ** 2).sum(axis=1)
+    return list(candidates[np.argsort(distances)[:k]])
+
+
+def measure(search: Callable[[np.ndarray, Optional[List[str]]], List[str]], queries: List[Dict], k: int) -> Dict:
+    latencies = []
+    hits = 0
+    for query in queries:
+        start = time.perf_counter()
+        result = search(query["vector"], query["filter"])
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(result[:k]) & query["expected"])
+
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "qps": round(len(latencies) / sum(latencies), 1),
+        f"recall@{k}": round(hits / (k * len(queries)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--chunks", type=int, default=50, help="Chunks per document")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--filter-sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--batch", type=int, default=512, help="Rows per insert batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="Insert batches completing out of order")
+    parser.add_argument("--skip-chroma", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ids, vectors, document_ids = make_corpus(args.documents, args.chunks, args.dimension, args.seed)
+    order = insertion_order(len(ids), args.batch, args.concurrency, args.seed)
+    rows_by_document: Dict[str, List[int]] = {}
+    for row, document_id in enumerate(document_ids):
+        rows_by_document.setdefault(document_id, []).append(row)
+
+    rng = np.random.default_rng(args.seed + 1)
+    workloads = {"unfiltered": None, **{f"filter_{size}_docs": size for size in args.filter_sizes}}
+    queries: Dict[str, List[Dict]] = {}
+    for name, size in workloads.items():
+        queries[name] = []
+        for _ in range(args.queries):
+            query = vectors[rng.integers(len(vectors))] + 0.5 * rng.standard_normal(args.dimension).astype(np.float32)
+            query /= np.linalg.norm(query)
+            selected = None
+            rows = None
+            if size:
+                selected = [f"doc-{i}" for i in rng.choice(args.documents, size=min(size, args.documents), replace=False)]
+                rows = np.array([row for document_id in selected for row in rows_by_document[document_id]])
+            expected = {ids[row] for row in exact_top_k(vectors, query, args.top_k, rows)}
+            queries[name].append({"vector": query, "filter": selected, "expected": expected})
+
+    workdir = tempfile.mkdtemp(prefix="vector-index-bench-")
+    results: Dict[str, Dict] = {}
+    try:
+        flat = FlatIndex(os.path.join(workdir, "flat"), save_interval=3600)
+        start = time.perf_counter()
+        for position in range(0, len(order), args.batch):
+            batch = order[position:position + args.batch]
+            flat.add([ids[row] for row in batch], vectors[batch], [document_ids[row] for row in batch])
+        build = time.perf_counter() - start
+        fragmented = flat.get_stats()["fragmented_documents"]
+        start = time.perf_counter()
+        flat.compact()
+        compact = time.perf_counter() - start
+        flat.save()
+        results["flat"] = {
+            "build_s": round(build, 2),
+            "compact_s": round(compact, 2),
+            "fragmented_documents_before_compact": fragmented,
+            **{
+                name: measure(lambda vector, selected: [c for c, _ in flat.search(vector, args.top_k, selected)],
+                              workload, args.top_k)
+                for name, workload in queries.items()
+            }
+        }
+
+        if not args.skip_chroma:
+            import chromadb
+            from chromadb.config import Settings as ChromaSettings
+
+            client = chromadb.PersistentClient(
+                path=os.path.join(workdir, "chroma"), settings=ChromaSettings(anonymized_telemetry=False)
+            )
+            collection = client.create_collection("benchmark")
+            start = time.perf_counter()
+            for position in range(0, len(order), args.batch):
+                batch = order[position:position + args.batch]
+                collection.add(
+                    ids=[ids[row] for row in batch],
+                    embeddings=vectors[batch].tolist(),
+                    metadatas=[{"document_id": document_ids[row]} for row in batch]
+                )
+
+            def chroma_search(vector, selected):
+                where = {"document_id": {"$in": selected}} if selected else None
+                return collection.query(query_embeddings=[vector.tolist()], n_results=args.top_k, where=where)["ids"][0]
+
+            results["chroma"] = {
+                "build_s": round(time.perf_counter() - start, 2),
+                **{name: measure(chroma_search, workload, args.top_k) for name, workload in queries.items()}
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
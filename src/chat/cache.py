@@ -0,0 +1,184 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.chat.schemas import SourceChunk
+from src.core.config import get_settings
+from src.core.logging import logger
+from src.core.metrics import cache_collector
+
+settings = get_settings()
+
+
+class AnswerCache:
+    """Answer cache scoped by document set, matched exactly or by question similarity"""
+
+    def __init__(self, max_entries: int, ttl: float, similarity_threshold: float, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        # Bumped on every invalidation so answers computed before it are not stored
+        self.generation = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._matrices: Dict[Tuple, Tuple[List[Tuple], np.ndarray]] = {}
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Normalize a question for exact matching"""
+        question = " ".join(question.lower().split())
+        return re.sub(r"[\s?.!]+$", "", question)
+
+    @staticmethod
+    def make_scope(document_ids: Optional[List[str]], top_k: int, *extra) -> Tuple:
+        """Build the cache scope for a document set and retrieval settings"""
+        documents = tuple(sorted(set(document_ids))) if document_ids else None
+        return (documents, top_k) + tuple(extra)
+
+    def get(self, question: str, embedding: List[float], scope: Tuple) -> Optional[Dict]:
+        """Return a cached answer for the question within the scope"""
+        if not self.enabled:
+            return None
+
+        key = (scope, self.normalize(question))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] < now:
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                entry = self._find_similar(scope, embedding, now)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(entry["key"])
+            self.hits += 1
+            return entry
+
+    def set(self, question: str, embedding: List[float], scope: Tuple, answer: str,
+            confidence: str, sources: List[SourceChunk], generation: int):
+        """Store an answer computed at the given cache generation"""
+        if not self.enabled:
+            return
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector = vector / norm
+
+        key = (scope, self.normalize(question))
+        depends_on = {source.document_id for source in sources}
+        if scope[0]:
+            depends_on.update(scope[0])
+
+        with self._lock:
+            if generation != self.generation:
+                # Documents changed while this answer was being generated
+                return
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = {
+                "key": key,
+                "vector": vector,
+                "answer": answer,
+                "confidence": confidence,
+                "sources": sources,
+                "depends_on": depends_on,
+                "expires_at": time.monotonic() + self.ttl
+            }
+            self._matrices.pop(scope, None)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_documents(self, document_ids: Iterable[str], include_unscoped: bool = False) -> int:
+        """Drop entries that depend on any of the documents
+
+        New documents can change the answer to any question asked across all
+        documents, so uploads also drop unscoped entries via include_unscoped.
+        """
+        document_ids = set(document_ids)
+
+        with self._lock:
+            self.generation += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry["depends_on"] & document_ids or (include_unscoped and key[0][0] is None)
+            ]
+            for key in stale:
+                self._remove(key)
+
+        if stale:
+            logger.info(f"Answer cache invalidated {len(stale)} entries")
+        return len(stale)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._matrices.clear()
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def _remove(self, key: Tuple):
+        del self._entries[key]
+        self._matrices.pop(key[0], None)
+
+    def _find_similar(self, scope: Tuple, embedding: List[float], now: float) -> Optional[Dict]:
+        if scope not in self._matrices:
+            keys = [key for key in self._entries if key[0] == scope]
+            if not keys:
+                return None
+            matrix = np.stack([self._entries[key]["vector"] for key in keys])
+            self._matrices[scope] = (keys, matrix)
+
+        keys, matrix = self._matrices[scope]
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return None
+
+        similarities = matrix @ (query / norm)
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.similarity_threshold:
+                break
+            entry = self._entries.get(keys[index])
+            if entry is not None and entry["expires_at"] >= now:
+                return entry
+
+        return None
+
+
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl=settings.ANSWER_CACHE_TTL,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    enabled=settings.ANSWER_CACHE_ENABLED
+)
+cache_collector.register("answer", answer_cache)
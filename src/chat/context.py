@@ -0,0 +1,121 @@
+from langchain_core.documents import Document
+from typing import Dict, List, Optional, Tuple
+
+from src.core.tokens import count_tokens, load_encoding
+
+SEPARATOR = "\n\n---\n\n"
+
+# Shorter suffix/prefix matches between neighbouring chunks are likely coincidence, not overlap
+MIN_OVERLAP = 16
+
+# A block is cut to fit the remaining budget only if at least this many tokens are left
+MIN_TRUNCATED_TOKENS = 64
+
+
+def strip_overlap(previous: str, text: str, max_overlap: int) -> str:
+    """Drop the start of `text` that repeats the end of `previous`"""
+    for size in range(min(max_overlap, len(previous), len(text)), MIN_OVERLAP - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:]
+    return "\n" + text
+
+
+class ContextPacker:
+    """Builds the prompt context from search hits within a token budget
+
+    Hits from consecutive chunks of the same document are merged into one
+    block with the splitter's overlap removed. Blocks are ordered by their
+    best-ranked hit and added until the budget is used up; the block that
+    crosses it is truncated, and anything ranked lower is left out.
+    """
+
+    def __init__(self, model: str, max_tokens: Optional[int], max_overlap: int, merge_adjacent: bool = True):
+        self.max_tokens = max_tokens
+        self.max_overlap = max_overlap
+        self.merge_adjacent = merge_adjacent
+
+        self.encoding = load_encoding(model)
+
+    def count_tokens(self, text: str) -> int:
+        return count_tokens(self.encoding, text)
+
+    def pack(self, hits: List[Document]) -> Tuple[str, List[int], Dict]:
+        """Pack hits (most relevant first) into a context string
+
+        Returns the context, the positions of the hits it contains and token
+        counts, including what concatenating every hit in full would cost.
+        """
+        naive_tokens = self.count_tokens(SEPARATOR.join(self._block(doc, doc.page_content) for doc in hits))
+
+        parts: List[str] = []
+        included: List[int] = []
+        used = 0
+        truncated = False
+        for positions in self._runs(hits):
+            text = hits[positions[0]].page_content
+            for previous, position in zip(positions, positions[1:]):
+                text += strip_overlap(hits[previous].page_content, hits[position].page_content, self.max_overlap)
+
+            block = self._block(hits[positions[0]], text)
+            separator_tokens = self.count_tokens(SEPARATOR) if parts else 0
+            tokens = self.count_tokens(block)
+
+            if self.max_tokens is not None and used + separator_tokens + tokens > self.max_tokens:
+                remaining = self.max_tokens - used - separator_tokens
+                # The best-ranked block is always kept, even if it has to be cut down
+                if remaining >= MIN_TRUNCATED_TOKENS or not parts:
+                    parts.append(self._truncate(block, remaining))
+                    included.extend(positions)
+                    truncated = True
+                break
+
+            parts.append(block)
+            included.extend(positions)
+            used += separator_tokens + tokens
+
+        context = SEPARATOR.join(parts)
+        packed_tokens = self.count_tokens(context)
+        return context, sorted(included), {
+            "hits": len(hits),
+            "hits_included": len(included),
+            "blocks": len(parts),
+            "truncated": truncated,
+            "naive_tokens": naive_tokens,
+            "context_tokens": packed_tokens,
+            "tokens_saved": max(naive_tokens - packed_tokens, 0)
+        }
+
+    def _runs(self, hits: List[Document]) -> List[List[int]]:
+        """Group hit positions into runs of consecutive chunks of one document, ordered by best rank"""
+        if not self.merge_adjacent:
+            return [[position] for position in range(len(hits))]
+
+        by_chunk: Dict[Tuple[str, int], int] = {}
+        runs: List[List[int]] = []
+        for position, doc in enumerate(hits):
+            chunk_index = doc.metadata.get("chunk_index")
+            if chunk_index is None:
+                runs.append([position])
+            else:
+                # A chunk returned twice is kept once, at its best rank
+                by_chunk.setdefault((doc.metadata.get("document_id", ""), chunk_index), position)
+
+        run: List[int] = []
+        last_key = None
+        for (document_id, chunk_index), position in sorted(by_chunk.items()):
+            if last_key == (document_id, chunk_index - 1):
+                run.append(position)
+            else:
+                run = [position]
+                runs.append(run)
+            last_key = (document_id, chunk_index)
+
+        return sorted(runs, key=min)
+
+    def _block(self, doc: Document, text: str) -> str:
+        return f"[Source: {doc.metadata.get('title', 'Unknown')}]\n{text}"
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
@@ -0,0 +1,341 @@
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from src.chat.models import ChatHistory
+from src.database import AsyncSessionLocal
+from src.core.config import get_settings
+from src.core.executor import run_blocking
+from src.core.logging import logger, log_error, log_performance
+from src.core.tracing import span
+
+settings = get_settings()
+
+OVERFLOW_POLICIES = ("block", "spill")
+
+# Ids looked up per query when replayed rows are checked against the table
+REPLAY_LOOKUP_BATCH = 500
+
+# Errors that say the database is unreachable rather than that it rejects the rows
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, ConnectionError, OSError, asyncio.TimeoutError)
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ChatHistoryWriter:
+    """Write-behind buffer for chat history rows
+
+    Rows arrive with their id and timestamp already set, are queued and
+    inserted in bulk once `batch_size` are waiting or `flush_interval`
+    seconds after the first one. When the queue is full, submitters either
+    wait for room ("block") or append their rows to the spill file
+    ("spill"). A batch the database rejects is spilled as well; spilled rows
+    are replayed on start and after the next successful flush, skipping ids
+    that are already stored. Rows that fail on their own during a replay are
+    moved to the dead-letter file instead of being spilled again.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int, overflow: str, spill_path: str,
+                 dead_letter_path: str, enabled: bool = True):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown chat history overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path
+        self.enabled = enabled
+        self.flushed = 0
+        self.spilled = 0
+        self.dead_lettered = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._spill_pending = False
+        self._spill_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def backlog(self) -> int:
+        """Rows queued but not yet inserted"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Start the flusher on the running event loop (no-op when write-behind is disabled)"""
+        if not self.enabled or self._task is not None:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._spill_pending = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Chat history write-behind started (batch {self.batch_size}, interval {self.flush_interval}s, "
+            f"overflow {self.overflow})"
+        )
+
+    async def stop(self):
+        """Flush every queued row; called once the server has stopped taking requests"""
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        await self._queue.put(None)
+        await task
+        logger.info(
+            f"Chat history write-behind stopped, {self.flushed} rows flushed, {self.spilled} spilled, "
+            f"{self.dead_lettered} dead-lettered"
+        )
+
+    async def submit(self, rows: List[Dict]):
+        """Queue rows for insertion, waiting for room or spilling when the queue is full"""
+        overflow = []
+        for row in rows:
+            if self.overflow == "block":
+                await self._queue.put(row)
+                continue
+            try:
+                self._queue.put_nowait(row)
+            except asyncio.QueueFull:
+                overflow.append(row)
+
+        if overflow:
+            logger.warning(f"Chat history queue full, spilling {len(overflow)} rows to {self.spill_path}")
+            await run_blocking(self._spill, overflow)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        await self._replay()
+
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    row = self._queue.get_nowait()
+
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._flush(batch)
+
+        # Rows queued while the stop signal was on its way
+        leftover = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not None:
+                leftover.append(row)
+        if leftover:
+            await self._flush(leftover)
+
+    async def _flush(self, rows: List[Dict]):
+        start_time = time.time()
+        try:
+            await self._insert(rows)
+        except Exception as e:
+            log_error(e, "chat history flush")
+            await self._spill_safely(rows)
+            return
+
+        self.flushed += len(rows)
+        log_performance("history_flush", time.time() - start_time, rows=len(rows))
+
+        if self._spill_pending:
+            await self._replay()
+
+    async def _insert(self, rows: List[Dict]):
+        with span("history_flush", rows=len(rows)):
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(ChatHistory), rows)
+                await db.commit()
+
+    async def _replay(self):
+        """Insert spilled rows that are not stored yet
+
+        A batch that fails is retried one row at a time. Rows the database
+        still rejects go to the dead-letter file; on connection errors the
+        remaining rows go back to the spill file for the next attempt.
+        """
+        self._spill_pending = False
+        try:
+            claimed, rows = await run_blocking(self._claim_spill)
+        except Exception as e:
+            log_error(e, "chat history spill replay")
+            return
+        if claimed is None:
+            return
+
+        rejected = set()
+        try:
+            async with AsyncSessionLocal() as db:
+                ids = list(rows)
+                stored = set()
+                for start in range(0, len(ids), REPLAY_LOOKUP_BATCH):
+                    result = await db.execute(
+                        select(ChatHistory.id).where(ChatHistory.id.in_(ids[start:start + REPLAY_LOOKUP_BATCH]))
+                    )
+                    stored.update(result.scalars().all())
+
+            missing = [row for row_id, row in rows.items() if row_id not in stored]
+            for start in range(0, len(missing), self.batch_size):
+                batch = missing[start:start + self.batch_size]
+                try:
+                    await self._insert(batch)
+                except TRANSIENT_ERRORS:
+                    raise
+                except Exception:
+                    failed = await self._insert_each(batch)
+                    await run_blocking(self._dead_letter, failed)
+                    rejected.update(row["id"] for row, _ in failed)
+
+            logger.info(
+                f"Replayed {len(missing) - len(rejected)} spilled chat history rows "
+                f"({len(stored)} already stored, {len(rejected)} dead-lettered)"
+            )
+
+        except Exception as e:
+            log_error(e, "chat history spill replay")
+            # Put the rows back for the next attempt; replaying is idempotent
+            if not await self._spill_safely([row for row_id, row in rows.items() if row_id not in rejected]):
+                return
+
+        await run_blocking(os.remove, claimed)
+
+    async def _insert_each(self, rows: List[Dict]) -> List[Tuple[Dict, Exception]]:
+        """Insert rows one at a time, returning those the database rejects with their errors"""
+        failed = []
+        for row in rows:
+            try:
+                await self._insert([row])
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                failed.append((row, e))
+        return failed
+
+    async def _spill_safely(self, rows: List[Dict]) -> bool:
+        try:
+            await run_blocking(self._spill, rows)
+            return True
+        except Exception as e:
+            log_error(e, "chat history spill")
+            logger.error(f"Lost {len(rows)} chat history rows")
+            return False
+
+    @contextmanager
+    def _spill_locked(self):
+        """Hold the spill file lock: writes and claims of this process's threads and of other workers never overlap
+
+        The spill file is renamed when it is claimed, so the lock is taken on a separate file next to it.
+        """
+        import fcntl
+
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(f"{self.spill_path}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _spill(self, rows: List[Dict]):
+        with self._spill_locked(), open(self.spill_path, "a") as f:
+            f.write("".join(
+                json.dumps({**row, "created_at": row["created_at"].isoformat()}) + "\n" for row in rows
+            ))
+        self.spilled += len(rows)
+        self._spill_pending = True
+
+    def _dead_letter(self, failed: List[Tuple[Dict, Exception]]):
+        """Append rows the database rejects to the dead-letter file, where replays no longer pick them up"""
+        if not failed:
+            return
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        with open(self.dead_letter_path, "a") as f:
+            f.write("".join(
+                json.dumps({**row, "created_at": row["created_at"].isoformat(), "error": str(error)}) + "\n"
+                for row, error in failed
+            ))
+        self.dead_lettered += len(failed)
+        logger.error(f"Moved {len(failed)} rejected chat history rows to {self.dead_letter_path}")
+
+    def _claim_spill(self):
+        """Take over the spill file (and replays left by stopped processes), returning the claimed path and rows by id"""
+        with self._spill_locked():
+            return self._claim_spill_locked()
+
+    def _claim_spill_locked(self):
+        claimed = f"{self.spill_path}.{os.getpid()}.replay"
+
+        # A process that died mid-replay leaves its claim behind; hand those rows back to the spill file
+        for orphan in glob.glob(f"{glob.escape(self.spill_path)}.*.replay"):
+            pid = orphan[len(self.spill_path) + 1:-len(".replay")]
+            if orphan == claimed or not pid.isdigit() or process_alive(int(pid)):
+                continue
+            with open(orphan) as src, open(self.spill_path, "a") as dst:
+                dst.write(src.read())
+            os.remove(orphan)
+
+        if not os.path.exists(claimed):
+            if not os.path.exists(self.spill_path):
+                return None, {}
+            # Writers hold the same lock, so none still has the renamed file open
+            os.replace(self.spill_path, claimed)
+
+        rows: Dict[str, Dict] = {}
+        with open(claimed) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+                rows[row["id"]] = row
+        return claimed, rows
+
+
+history_writer = ChatHistoryWriter(
+    batch_size=settings.CHAT_HISTORY_BATCH_SIZE,
+    flush_interval=settings.CHAT_HISTORY_FLUSH_INTERVAL,
+    max_pending=settings.CHAT_HISTORY_MAX_PENDING,
+    overflow=settings.CHAT_HISTORY_OVERFLOW,
+    spill_path=settings.CHAT_HISTORY_SPILL_PATH,
+    dead_letter_path=settings.CHAT_HISTORY_DEAD_LETTER_PATH,
+    enabled=settings.CHAT_HISTORY_WRITE_BEHIND
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, Float
+from sqlalchemy import Column, String, Text, DateTime, Float, Index
 from sqlalchemy.sql import func
 from src.database import Base
 import uuid
@@ -19,5 +19,11 @@ class ChatHistory(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        # Keyset pagination (newest first) and date range filters
+        Index("ix_chat_history_created_at_id", "created_at", "id"),
+        Index("ix_chat_history_confidence_created_at_id", "confidence", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<ChatHistory(id={self.id}, question={self.question[:50]}...)>"
\ No newline at end of file
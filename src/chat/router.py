@@ -1,32 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Dict, Literal, Optional
+import json
 
-from src.chat.schemas import QuestionRequest, AnswerResponse, ChatHistoryResponse
+from src.chat.schemas import (
+    QuestionRequest, AnswerResponse, ChatHistoryResponse, BatchQuestionRequest, BatchAnswerResponse
+)
 from src.chat.service import chat_service
-from src.database import get_db
-from src.core.logging import log_request
+from src.database import get_async_db
+from src.core.config import get_settings
+from src.core.logging import logger, log_request, log_error
+from src.core.pagination import InvalidCursorError, etag_matches, page_etag
 from src.core.rate_limit import limiter
 from src.core.security import verify_api_key
 
 router = APIRouter()
+settings = get_settings()
 
 @router.post("/ask",response_model=AnswerResponse)
 @limiter.limit("10/minute")
 async def ask_question(
     request: Request,
     question_data: QuestionRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Ask a question and get an answer based on documents"""
     log_request("/chat/ask", "POST", question= question_data.question[:50])
     
     try:
-        answer = chat_service.ask_question(
+        answer = await chat_service.ask_question(
             question=question_data.question,
             document_ids=question_data.document_ids,
             top_k=question_data.top_k or 3,
-            db=db
+            db=db,
+            retrieval_mode=question_data.retrieval_mode
         )
         
         return answer
@@ -38,18 +47,91 @@ async def ask_question(
         )
         
         
+@router.post("/ask/batch", response_model=BatchAnswerResponse)
+@limiter.limit("5/minute")
+async def ask_batch(
+    request: Request,
+    batch_data: BatchQuestionRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Answer many questions in one call; failures are reported per question"""
+    log_request("/chat/ask/batch", "POST", questions=len(batch_data.questions))
+    
+    if len(batch_data.questions) > settings.CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"Too many questions. Max per request: {settings.CHAT_BATCH_MAX_QUESTIONS}"
+        )
+    
+    try:
+        return await chat_service.ask_batch(
+            questions=batch_data.questions,
+            document_ids=batch_data.document_ids,
+            top_k=batch_data.top_k or 3,
+            db=db,
+            retrieval_mode=batch_data.retrieval_mode
+        )
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to answer questions: {str(e)}"
+        )
+        
+        
+def format_sse(event: Dict) -> str:
+    """Encode an event as a server-sent-events message"""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+@router.post("/ask/stream")
+@limiter.limit("10/minute")
+async def ask_question_stream(
+    request: Request,
+    question_data: QuestionRequest,
+):
+    """Ask a question and stream sources, answer tokens and a final summary as SSE"""
+    log_request("/chat/ask/stream", "POST", question= question_data.question[:50])
+    
+    async def event_stream():
+        events = chat_service.stream_answer(
+            question=question_data.question,
+            document_ids=question_data.document_ids,
+            top_k=question_data.top_k or 3,
+            retrieval_mode=question_data.retrieval_mode,
+        )
+        try:
+            async for event in events:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, cancelling answer stream")
+                    break
+                yield format_sse(event)
+                
+        except Exception as e:
+            log_error(e, "ask_question_stream")
+            yield format_sse({"event": "error", "data": {"detail": f"Failed to answer question: {str(e)}"}})
+            
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+        
+        
 @router.get("/ask/simple")
 @limiter.limit("10/minute")
 async def ask_question_simple(
     question: str,
     request : Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Simple endpoint: just ask a question"""
     log_request("/chat/ask/simple","GET", question = question[:50])
     
     try:
-        answer = chat_service.ask_question(
+        answer = await chat_service.ask_question(
             question=question,
             document_ids=None,
             top_k=3,
@@ -73,21 +155,40 @@ async def ask_question_simple(
 @limiter.limit("10/minute")
 async def get_chat_history(
     request : Request,
-    limit: int = 50,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    confidence: Optional[Literal["high", "medium", "low"]] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get recent chat history"""
-    log_request("/chat/history", "GET", limit=limit)
+    """Get chat history newest first; the next page's cursor is in the X-Next-Cursor header"""
+    log_request("/chat/history", "GET", limit=limit, cursor=bool(cursor), confidence=confidence)
     
-    if limit > 100:
-        limit = 100
-        
     try:
-        history = chat_service.get_chat_history(db, limit=limit)
-        return history
+        history, next_cursor = await chat_service.get_chat_history(
+            db, limit=limit, cursor=cursor, confidence=confidence,
+            created_after=created_after, created_before=created_before
+        )
+    
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get history: {str(e)}"
-        )
\ No newline at end of file
+        )
+    
+    # History rows never change, so their ids identify the page
+    etag = page_etag(chat.id for chat in history)
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return history
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel,Field
-from typing import Optional,List
+from typing import Optional,List,Literal,Annotated
 from datetime import datetime
 
 class QuestionRequest(BaseModel):
@@ -14,6 +14,10 @@ class QuestionRequest(BaseModel):
         le=10,
         description= "Number of relavant chunks to retrieve"
     )
+    retrieval_mode: Optional[Literal["dense", "keyword", "hybrid"]] = Field(
+        None,
+        description="dense (embeddings), keyword (BM25) or hybrid (both, rank-fused); defaults to RETRIEVAL_MODE"
+    )
     
     
 class SourceChunk(BaseModel):
@@ -35,6 +39,42 @@ class AnswerResponse(BaseModel):
         None, description="Confidence level: high/medium/low"
     )
     created_at: datetime
+    cached: bool = Field(
+        False, description="Whether the answer was served from the answer cache"
+    )
+    context_tokens: Optional[int] = Field(
+        None, description="Prompt context size in tokens after packing"
+    )
+    context_tokens_saved: Optional[int] = Field(
+        None, description="Tokens saved against concatenating every retrieved chunk in full"
+    )
+    
+    
+class BatchQuestionRequest(BaseModel):
+    """Request schema for answering many questions in one call"""
+    questions: List[Annotated[str, Field(min_length=1)]] = Field(..., min_length=1, description="Questions to ask")
+    document_ids: Optional[List[str]] = Field(
+        None, description="Specific document IDs to search (optional), shared by all questions"
+    )
+    top_k : Optional[int] = Field(None, ge=1, le=10, description="Number of relavant chunks to retrieve per question")
+    retrieval_mode: Optional[Literal["dense", "keyword", "hybrid"]] = Field(
+        None, description="dense, keyword or hybrid; defaults to RETRIEVAL_MODE"
+    )
+    
+    
+class BatchAnswerItem(BaseModel):
+    """Result for one question of a batch: an answer or an error"""
+    index: int
+    question: str
+    answer: Optional[AnswerResponse] = None
+    error: Optional[str] = None
+    
+    
+class BatchAnswerResponse(BaseModel):
+    """Response schema for a batch of questions"""
+    results: List[BatchAnswerItem]
+    succeeded: int
+    failed: int
     
     
 class ChatHistoryResponse(BaseModel):
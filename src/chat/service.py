@@ -1,18 +1,33 @@
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from sqlalchemy.orm import Session
-from typing import Optional, List, Dict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Tuple, AsyncIterator
+import asyncio
 import json
 import time
+import uuid
 
 from src.chat.models import ChatHistory
-from src.chat.schemas import SourceChunk, AnswerResponse
+from src.chat.schemas import SourceChunk, AnswerResponse, BatchAnswerItem, BatchAnswerResponse
+from src.chat.cache import answer_cache
+from src.chat.context import ContextPacker
+from src.chat.history import history_writer
 from src.vector_store.client import vector_store
+from src.database import AsyncSessionLocal
+from src.core.cache import LRUCache
 from src.core.config import get_settings
-from src.core.logging import logger, log_performance
+from src.core.executor import run_blocking
+from src.core.logging import logger, log_performance, log_error
+from src.core.metrics import TOKENS, cache_collector, record_llm_usage, track_stage
+from src.core.pagination import keyset_page, split_page
+from src.core.tracing import span
 
 settings = get_settings()
 
+NO_CONTEXT_ANSWER = "I couldn't find any. relevant information in the documents to answer your question."
+
 class ChatService:
     """Service for chat/Q&A operations"""
     
@@ -20,7 +35,10 @@ class ChatService:
         self.llm = ChatOpenAI(
             model=settings.OPENAI_CHAT_MODEL,
             temperature=0,
-            openai_api_key =settings.OPENAI_API_KEY
+            openai_api_key =settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            # Streamed completions report token usage in their final chunk
+            stream_usage=True
         )
         
         self.qa_prompt = ChatPromptTemplate.from_messages(
@@ -42,26 +60,110 @@ class ChatService:
             ]
         )
         
-    def search_similar(self, query:str, k:int=3, document_ids : Optional[List[str]]= None) -> List[tuple]:
+        self.query_embedding_cache = LRUCache(
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=settings.QUERY_EMBEDDING_CACHE_TTL
+        )
+        cache_collector.register("query_embedding", self.query_embedding_cache)
+        
+        self.context_packer = ContextPacker(
+            model=settings.OPENAI_CHAT_MODEL,
+            max_tokens=settings.CONTEXT_MAX_TOKENS,
+            max_overlap=settings.CHUNK_OVERLAP,
+            merge_adjacent=settings.CONTEXT_MERGE_ADJACENT
+        )
+        
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a question, reusing recent vectors for the same text"""
+        key = " ".join(query.split())
+        embedding = self.query_embedding_cache.get(key)
+        
+        if embedding is None:
+            start_time = time.time()
+            with span("embed_query"):
+                embedding = await vector_store.aembed_query(key)
+            self.query_embedding_cache.set(key, embedding)
+            log_performance("embed_query", time.time() - start_time)
+            
+        return embedding
+    
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many questions with one call for those not in the query cache"""
+        keys = [" ".join(query.split()) for query in queries]
+        embeddings = {key: self.query_embedding_cache.get(key) for key in keys}
+        missing = [key for key in dict.fromkeys(keys) if embeddings[key] is None]
+        
+        if missing:
+            start_time = time.time()
+            with span("embed_query", batch=len(missing)):
+                vectors = await vector_store.aembed_queries(missing)
+            for key, embedding in zip(missing, vectors):
+                self.query_embedding_cache.set(key, embedding)
+                embeddings[key] = embedding
+            log_performance("embed_query", time.time() - start_time, batch=len(missing))
+            
+        return [embeddings[key] for key in keys]
+        
+    async def search_similar(self, query:str, k:int=3, document_ids : Optional[List[str]]= None,
+                             mode: str = "dense") -> List[tuple]:
         """Search for similar chunks"""
         start_time = time.time()
         
-        filter_dict = None
-        if document_ids:
-            filter_dict = {"document_id": {"$in": document_ids}}
-        
-        results = vector_store.search_similar(query=query, k=k, filter_dict=filter_dict)
+        if mode == "keyword":
+            with track_stage("keyword_query"):
+                results = await run_blocking(vector_store.keyword_search, query=query, k=k, document_ids=document_ids)
+            
+        elif mode == "hybrid":
+            embedding = await self.embed_query(query)
+            with track_stage("hybrid_query"):
+                results = await run_blocking(vector_store.hybrid_search, query=query, embedding=embedding, k=k, document_ids=document_ids)
+            
+        else:
+            embedding = await self.embed_query(query)
+            with track_stage("vector_query"):
+                results = await run_blocking(vector_store.search_by_vector, embedding=embedding, k=k, document_ids=document_ids)
         
-        log_performance("search_similarity", time.time() - start_time, k=k)
+        log_performance("search_similarity", time.time() - start_time, k=k, mode=mode)
         return results  
     
-    def generate_answer(self, question:str, context: str) -> str:
+    async def search_similar_batch(self, queries: List[str], embeddings: List[List[float]], k: int = 3,
+                                   document_ids: Optional[List[str]] = None, mode: str = "dense") -> List[List[tuple]]:
+        """Search for many questions in one executor call (and one Chroma query in dense mode)"""
+        start_time = time.time()
+        
+        if mode == "keyword":
+            def search():
+                return [vector_store.keyword_search(query, k, document_ids) for query in queries]
+            stage = "keyword_query"
+            
+        elif mode == "hybrid":
+            def search():
+                return [
+                    vector_store.hybrid_search(query, embedding, k, document_ids)
+                    for query, embedding in zip(queries, embeddings)
+                ]
+            stage = "hybrid_query"
+            
+        else:
+            def search():
+                return vector_store.search_by_vectors(embeddings, k, document_ids)
+            stage = "vector_query"
+        
+        with track_stage(stage):
+            results = await run_blocking(search)
+        
+        log_performance("search_similarity", time.time() - start_time, k=k, mode=mode, batch=len(queries))
+        return results
+    
+    async def generate_answer(self, question:str, context: str) -> str:
         """Generate answer using LLM"""
         start_time = time.time()
         
         messages = self.qa_prompt.format_messages(context=context, question= question)
-        response = self.llm.invoke(messages)
+        with track_stage("llm"):
+            response = await self.llm.ainvoke(messages)
         answer = response.content
+        record_llm_usage(response.usage_metadata)
         
         log_performance("generate_answer", time.time() - start_time)
         return answer
@@ -80,35 +182,56 @@ class ChatService:
             return "low"
         
         
-    def save_chat(self, question:str, answer: str, confidence: str, top_k: int, document_ids : Optional[List[str]], db:Session) -> ChatHistory:
+    async def save_chat(self, question:str, answer: str, confidence: str, top_k: int, document_ids : Optional[List[str]], db:AsyncSession) -> ChatHistory:
         """Save chat to history"""
-        chat = ChatHistory(
-            question= question,
-            answer = answer,
-            confidence = confidence,
-            top_k= top_k,
-            document_ids=json.dumps(document_ids) if document_ids else None
-            
-        )
+        chats = await self.save_chats([(question, answer, confidence)], top_k, document_ids, db)
+        return chats[0]
+    
+    async def save_chats(self, chats: List[Tuple[str, str, str]], top_k: int, document_ids: Optional[List[str]],
+                         db: AsyncSession) -> List[ChatHistory]:
+        """Save many (question, answer, confidence) rows
         
-        db.add(chat)
-        db.commit()
-        db.refresh(chat)
+        Ids and timestamps are assigned here, so the rows need no refresh. With
+        write-behind enabled the rows are queued for a bulk insert instead of
+        being committed before the response.
+        """
+        created_at = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "question": question,
+                "answer": answer,
+                "confidence": confidence,
+                "top_k": top_k,
+                "document_ids": json.dumps(document_ids) if document_ids else None,
+                "created_at": created_at
+            }
+            for question, answer, confidence in chats
+        ]
         
-        logger.info(f"Chat saved: {chat.id}")
-        return chat
-    
-    def ask_question(self, question:str, document_ids: Optional[List[str]], top_k:int, db:Session )-> AnswerResponse:
-        """Main RAG workflow"""
+        if history_writer.running:
+            await history_writer.submit(rows)
+            return [ChatHistory(**row) for row in rows]
         
-        start_time = time.time()
+        chat_rows = [ChatHistory(**row) for row in rows]
+        db.add_all(chat_rows)
+        with track_stage("db_commit"):
+            await db.commit()
         
-        search_results = self.search_similar(query=question, k=top_k, document_ids=document_ids)
+        logger.info(f"Saved {len(chat_rows)} chats")
+        return chat_rows
+    
+    def build_context(self, search_results: List[tuple]) -> Tuple[List[SourceChunk], str, Dict]:
+        """Turn search hits into source citations and the packed prompt context
         
-        sources = []
-        context_parts = []
+        Only hits that made it into the context are cited.
+        """
+        with track_stage("context_packing"):
+            context, included, packing = self.context_packer.pack([doc for doc, _ in search_results])
         
-        for doc,score in search_results:
+        sources = []
+        for position in included:
+            doc, score = search_results[position]
             source = SourceChunk(
                 document_id = doc.metadata.get("document_id", ""),
                 document_title=doc.metadata.get("title","Unknown"),
@@ -117,19 +240,53 @@ class ChatService:
                 similarity_score=float(score)
             )
             sources.append(source)
-            context_parts.append(f"[Source: {doc.metadata.get('title','Unknown')}]\n{doc.page_content}")
         
-        context = "\n\n---\n\n".join(context_parts)    
+        if search_results:
+            TOKENS.labels("context").inc(packing["context_tokens"])
+            TOKENS.labels("context_saved").inc(packing["tokens_saved"])
+            logger.info(f"Context packed: {packing['tokens_saved']} tokens saved", extra=packing)
+        
+        return sources, context, packing
+    
+    async def ask_question(self, question:str, document_ids: Optional[List[str]], top_k:int, db:AsyncSession,
+                           retrieval_mode: Optional[str] = None)-> AnswerResponse:
+        """Main RAG workflow"""
+        
+        start_time = time.time()
+        retrieval_mode = retrieval_mode or settings.RETRIEVAL_MODE
+        
+        cache_scope = answer_cache.make_scope(document_ids, top_k, retrieval_mode)
+        cache_generation = answer_cache.generation
+        embedding = await self.embed_query(question)
+        
+        cached = answer_cache.get(question, embedding, cache_scope)
+        if cached is not None:
+            chat = await self.save_chat(question, cached["answer"], cached["confidence"], top_k, document_ids, db)
+            log_performance("ask_question", time.time() - start_time, cached=True)
+            
+            return AnswerResponse(
+                id = chat.id,
+                question = question,
+                answer = cached["answer"],
+                sources = cached["sources"],
+                confidence = cached["confidence"],
+                created_at = chat.created_at,
+                cached = True
+            )
+        
+        search_results = await self.search_similar(query=question, k=top_k, document_ids=document_ids, mode=retrieval_mode)
+        sources, context, packing = self.build_context(search_results)
             
-        if not context_parts:
-            answer = "I couldn't find any. relevant information in the documents to answer your question."
+        if not sources:
+            answer = NO_CONTEXT_ANSWER
             confidence = "low"
             
         else:
-            answer = self.generate_answer(question, context)
+            answer = await self.generate_answer(question, context)
             confidence = self.assess_confidence(answer, len(sources))
+            answer_cache.set(question, embedding, cache_scope, answer, confidence, sources, cache_generation)
             
-        chat = self.save_chat(question,answer, confidence, top_k, document_ids, db)
+        chat = await self.save_chat(question,answer, confidence, top_k, document_ids, db)
         
         log_performance("ask_question", time.time() - start_time)
         
@@ -139,12 +296,206 @@ class ChatService:
             answer = answer,
             sources= sources,
             confidence = confidence,
-            created_at = chat.created_at
+            created_at = chat.created_at,
+            context_tokens = packing["context_tokens"],
+            context_tokens_saved = packing["tokens_saved"]
         )
         
-    def get_chat_history(self, db:Session, limit: int = 50) -> List[ChatHistory]:
-        """Get recent chat history"""
-        return db.query(ChatHistory).order_by(ChatHistory.created_at.desc()).limit(limit).all()
+    async def ask_batch(self, questions: List[str], document_ids: Optional[List[str]], top_k: int, db: AsyncSession,
+                        retrieval_mode: Optional[str] = None) -> BatchAnswerResponse:
+        """RAG workflow for many questions
+        
+        Questions are embedded in one call and searched together, answers are
+        generated concurrently (at most CHAT_BATCH_CONCURRENCY at a time) and
+        all history rows are saved in one transaction. A question that fails
+        is reported in its result without failing the others.
+        """
+        start_time = time.time()
+        retrieval_mode = retrieval_mode or settings.RETRIEVAL_MODE
+        
+        cache_scope = answer_cache.make_scope(document_ids, top_k, retrieval_mode)
+        cache_generation = answer_cache.generation
+        outcomes: List[Dict] = [{"question": question} for question in questions]
+        pending: List[int] = []
+        
+        try:
+            embeddings = await self.embed_queries(questions)
+        except Exception as e:
+            log_error(e, "ask_batch")
+            for outcome in outcomes:
+                outcome["error"] = f"Failed to embed question: {str(e)}"
+        else:
+            for index, (question, embedding) in enumerate(zip(questions, embeddings)):
+                cached = answer_cache.get(question, embedding, cache_scope)
+                if cached is None:
+                    pending.append(index)
+                else:
+                    outcomes[index].update(
+                        answer=cached["answer"], confidence=cached["confidence"], sources=cached["sources"], cached=True
+                    )
+        
+        if pending:
+            try:
+                search_results = await self.search_similar_batch(
+                    [questions[index] for index in pending], [embeddings[index] for index in pending],
+                    k=top_k, document_ids=document_ids, mode=retrieval_mode
+                )
+            except Exception as e:
+                log_error(e, "ask_batch")
+                for index in pending:
+                    outcomes[index]["error"] = f"Failed to search documents: {str(e)}"
+                search_results = []
+            
+            semaphore = asyncio.Semaphore(settings.CHAT_BATCH_CONCURRENCY)
+            
+            async def answer(index: int, results: List[tuple]):
+                outcome = outcomes[index]
+                sources, context, packing = self.build_context(results)
+                outcome.update(
+                    sources=sources, context_tokens=packing["context_tokens"], context_tokens_saved=packing["tokens_saved"]
+                )
+                if not sources:
+                    outcome.update(answer=NO_CONTEXT_ANSWER, confidence="low")
+                    return
+                
+                try:
+                    async with semaphore:
+                        answer = await self.generate_answer(outcome["question"], context)
+                except Exception as e:
+                    log_error(e, "ask_batch")
+                    outcome["error"] = f"Failed to answer question: {str(e)}"
+                    return
+                
+                confidence = self.assess_confidence(answer, len(sources))
+                embedding = embeddings[index]
+                answer_cache.set(outcome["question"], embedding, cache_scope, answer, confidence, sources, cache_generation)
+                outcome.update(answer=answer, confidence=confidence)
+            
+            await asyncio.gather(*(answer(index, results) for index, results in zip(pending, search_results)))
+        
+        answered = [outcome for outcome in outcomes if "error" not in outcome]
+        if answered:
+            chats = await self.save_chats(
+                [(outcome["question"], outcome["answer"], outcome["confidence"]) for outcome in answered],
+                top_k, document_ids, db
+            )
+            for outcome, chat in zip(answered, chats):
+                outcome["chat"] = chat
+        
+        results = []
+        for index, outcome in enumerate(outcomes):
+            if "error" in outcome:
+                results.append(BatchAnswerItem(index=index, question=outcome["question"], error=outcome["error"]))
+                continue
+            
+            chat = outcome["chat"]
+            results.append(BatchAnswerItem(
+                index=index,
+                question=outcome["question"],
+                answer=AnswerResponse(
+                    id = chat.id,
+                    question = outcome["question"],
+                    answer = outcome["answer"],
+                    sources = outcome["sources"],
+                    confidence = outcome["confidence"],
+                    created_at = chat.created_at,
+                    cached = outcome.get("cached", False),
+                    context_tokens = outcome.get("context_tokens"),
+                    context_tokens_saved = outcome.get("context_tokens_saved")
+                )
+            ))
+        
+        failed = len(outcomes) - len(answered)
+        log_performance("ask_batch", time.time() - start_time, questions=len(questions), failed=failed)
+        return BatchAnswerResponse(results=results, succeeded=len(answered), failed=failed)
+        
+    async def stream_answer(self, question:str, document_ids: Optional[List[str]], top_k:int,
+                            retrieval_mode: Optional[str] = None) -> AsyncIterator[Dict]:
+        """RAG workflow yielding sources, answer tokens and a final summary event
+        
+        Closing the generator (e.g. on client disconnect) cancels the upstream
+        completion and skips saving the chat.
+        """
+        start_time = time.time()
+        retrieval_mode = retrieval_mode or settings.RETRIEVAL_MODE
+        
+        cache_scope = answer_cache.make_scope(document_ids, top_k, retrieval_mode)
+        cache_generation = answer_cache.generation
+        embedding = await self.embed_query(question)
+        
+        packing = None
+        cached = answer_cache.get(question, embedding, cache_scope)
+        if cached is not None:
+            sources = cached["sources"]
+            yield {"event": "sources", "data": [source.model_dump() for source in sources]}
+            yield {"event": "token", "data": {"text": cached["answer"]}}
+            answer, confidence = cached["answer"], cached["confidence"]
+            
+        else:
+            search_results = await self.search_similar(query=question, k=top_k, document_ids=document_ids, mode=retrieval_mode)
+            sources, context, packing = self.build_context(search_results)
+            yield {"event": "sources", "data": [source.model_dump() for source in sources]}
+            
+            if not sources:
+                answer = NO_CONTEXT_ANSWER
+                confidence = "low"
+                yield {"event": "token", "data": {"text": answer}}
+                
+            else:
+                llm_start = time.time()
+                messages = self.qa_prompt.format_messages(context=context, question= question)
+                answer_parts = []
+                stream = self.llm.astream(messages)
+                try:
+                    with track_stage("llm"):
+                        async for chunk in stream:
+                            record_llm_usage(chunk.usage_metadata)
+                            if chunk.content:
+                                answer_parts.append(chunk.content)
+                                yield {"event": "token", "data": {"text": chunk.content}}
+                finally:
+                    await stream.aclose()
+                    
+                log_performance("generate_answer", time.time() - llm_start, streamed=True)
+                answer = "".join(answer_parts)
+                confidence = self.assess_confidence(answer, len(sources))
+                answer_cache.set(question, embedding, cache_scope, answer, confidence, sources, cache_generation)
+        
+        # The request-scoped session is closed before a streamed body is sent
+        async with AsyncSessionLocal() as db:
+            chat = await self.save_chat(question, answer, confidence, top_k, document_ids, db)
+            
+        log_performance("ask_question", time.time() - start_time, streamed=True)
+        
+        yield {
+            "event": "done",
+            "data": {
+                "id": chat.id,
+                "confidence": confidence,
+                "created_at": chat.created_at.isoformat() if chat.created_at else None,
+                "cached": cached is not None,
+                "context_tokens": packing["context_tokens"] if packing else None,
+                "context_tokens_saved": packing["tokens_saved"] if packing else None
+            }
+        }
+        
+    async def get_chat_history(self, db:AsyncSession, limit: int = 50, cursor: Optional[str] = None,
+                               confidence: Optional[str] = None, created_after: Optional[datetime] = None,
+                               created_before: Optional[datetime] = None) -> Tuple[List[ChatHistory], Optional[str]]:
+        """Get chat history newest first, one keyset page at a time
+        
+        Returns the page and the cursor of the next one (None on the last page).
+        """
+        stmt = select(ChatHistory)
+        if confidence:
+            stmt = stmt.where(ChatHistory.confidence == confidence)
+        if created_after is not None:
+            stmt = stmt.where(ChatHistory.created_at >= created_after)
+        if created_before is not None:
+            stmt = stmt.where(ChatHistory.created_at < created_before)
+        
+        result = await db.execute(keyset_page(stmt, ChatHistory.created_at, ChatHistory.id, cursor, limit))
+        return split_page(list(result.scalars().all()), limit)
     
     
 chat_service = ChatService()
\ No newline at end of file
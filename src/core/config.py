@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     
@@ -10,24 +11,137 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL when unset
     
     # OpenAI
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None  # OpenAI-compatible endpoint, e.g. a local stand-in for benchmarks
     OPENAI_EMBEDDING_MODEL:str = "text-embedding-3-small"
     OPENAI_CHAT_MODEL: str = "gpt-3.5-turbo"
     
+    # Embedding Backend
+    EMBEDDING_BACKEND: str = "openai"  # openai | onnx | hashing
+    EMBEDDING_DIMENSION: Optional[int] = None  # hashing size / override for unknown OpenAI models
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 64
+    EMBEDDING_WORKERS: int = 4
+    ONNX_MODEL_DIR: Optional[str] = None
+    
     # Vector Store
     CHROMA_PERSIST_DIR:str = "./chroma_db"
     CHROMA_COLLECTION_NAME:str = "documents"
     
+    # Vector Index (Chroma keeps text and metadata either way)
+    VECTOR_INDEX_BACKEND: str = "chroma"  # chroma (HNSW) | flat (exact, memory-mapped, fast document filters)
+    FLAT_INDEX_DIR: str = "./flat_index"
+    FLAT_INDEX_COMPACT_RATIO: float = 0.2  # tombstoned fraction of rows that triggers compaction
+    FLAT_INDEX_SAVE_INTERVAL: float = 5.0  # seconds
+    FLAT_INDEX_QUANTIZATION: str = "none"  # none | float16 | int8 (first pass on compact codes, float32 rescoring)
+    FLAT_INDEX_RESCORE_MULTIPLIER: int = 4  # candidates rescored per requested result
+    
+    # Vector Search Service (one process owns the index, API workers connect over a Unix socket)
+    VECTOR_STORE_MODE: str = "local"  # local (index opened by every API process) | remote
+    VECTOR_SERVICE_SOCKET: str = "./vector_service.sock"
+    VECTOR_SERVICE_TIMEOUT: float = 300.0  # seconds per request; index rebuilds are slow
+    VECTOR_SERVICE_BATCH_WINDOW: float = 0.002  # seconds a query waits for others to be searched with
+    VECTOR_SERVICE_MAX_BATCH: int = 64  # queries per batched search
+    
+    # Embedding Cache
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+    
+    # Keyword (BM25) Index
+    KEYWORD_INDEX_PATH: str = "./keyword_index/bm25.json"
+    KEYWORD_INDEX_SAVE_INTERVAL: float = 5.0  # seconds
+    
     # RAG Settings
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     TOP_K_RESULTS: int =3
+    RETRIEVAL_MODE: str = "dense"  # dense | keyword | hybrid
+    HYBRID_CANDIDATE_MULTIPLIER: int = 4
+    RRF_K: int = 60
+    
+    # Context Packing
+    CONTEXT_MAX_TOKENS: Optional[int] = 3000  # prompt context budget (tiktoken), None for no limit
+    CONTEXT_MERGE_ADJACENT: bool = True  # merge neighbouring chunks and drop their overlap
+    
+    # Batch Questions
+    CHAT_BATCH_MAX_QUESTIONS: int = 200
+    CHAT_BATCH_CONCURRENCY: int = 8  # LLM calls in flight per batch
+    
+    # Query Embedding Cache
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    QUERY_EMBEDDING_CACHE_TTL: int = 3600  # seconds
+    
+    # Answer Cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL: int = 24 * 3600  # seconds
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.97
+    
+    # Chat History (write-behind: rows are queued and inserted in bulk off the request path)
+    CHAT_HISTORY_WRITE_BEHIND: bool = False
+    CHAT_HISTORY_BATCH_SIZE: int = 200  # rows per bulk insert
+    CHAT_HISTORY_FLUSH_INTERVAL: float = 1.0  # seconds a queued row waits at most
+    CHAT_HISTORY_MAX_PENDING: int = 10000  # queued rows before the overflow policy applies
+    CHAT_HISTORY_OVERFLOW: str = "block"  # block (wait for room) | spill (append to the spill file)
+    CHAT_HISTORY_SPILL_PATH: str = "./chat_history_spill/chat_history.jsonl"
+    CHAT_HISTORY_DEAD_LETTER_PATH: str = "./chat_history_spill/chat_history.dead.jsonl"  # rows the database rejects
     
     # File Upload
     UPLOAD_DIR:str= "./uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024 #10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024 #1MB
+    
+    # Concurrency
+    BLOCKING_EXECUTOR_WORKERS: int = 16
+    EXTRACTION_PROCESSES: Optional[int] = None  # defaults to the CPU count
+    
+    # PDF Extraction
+    PDF_PAGES_PER_TASK: int = 25
+    PDF_EXTRACTION_WINDOW: Optional[int] = None  # page ranges in flight, defaults to 2x processes
+    
+    # Ingestion Jobs
+    INGESTION_WORKERS: int = 2
+    INGESTION_PROGRESS_INTERVAL: float = 1.0  # seconds between job progress writes
+    JOB_LEASE_SECONDS: float = 60  # running jobs whose worker stops renewing this long are requeued
+    
+    # Bulk Upload
+    BULK_MAX_FILES: int = 10000  # files per request, including archive entries
+    BULK_MAX_ARCHIVE_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB
+    BULK_PREFETCH_FILES: int = 4  # files extracted and split ahead of embedding
+    BULK_COMMIT_FILES: int = 50  # documents committed per group
+    
+    # Deletion and Garbage Collection
+    DELETE_BATCH_SIZE: int = 500  # documents per filtered vector delete
+    BULK_DELETE_MAX_DOCUMENTS: int = 10000
+    GC_INTERVAL: float = 21600  # seconds between orphan sweeps, 0 disables
+    GC_MIN_FILE_AGE: float = 3600  # seconds before an unreferenced upload file is removed
+    
+    # Embedding Batches
+    EMBEDDING_BATCH_MAX_TOKENS: int = 50000
+    EMBEDDING_BATCH_MAX_ITEMS: int = 512
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_RETRY_BACKOFF: float = 1.0  # seconds, doubled per attempt
+    
+    # Rate Limiting (token buckets per route and API key)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "shared"  # memory (one worker) | shared (all workers on the host) | redis
+    RATE_LIMIT_KEY: str = "api_key"  # api_key | address
+    RATE_LIMIT_SLOTS: int = 65536  # buckets in the shared table / memory store
+    RATE_LIMIT_SHARED_PATH: Optional[str] = None  # defaults to /dev/shm/document-qa-rate-limit
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # e.g. redis://localhost:6379/0
+    
+    # Metrics (Prometheus, served at /metrics without the API key)
+    METRICS_ENABLED: bool = True
+    
+    # Tracing (per-request stage timings in the Server-Timing header, optional OTLP/JSON export)
+    SERVER_TIMING_ENABLED: bool = True
+    TRACE_EXPORT_PATH: Optional[str] = None  # JSON lines file
+    TRACE_EXPORT_ENDPOINT: Optional[str] = None  # OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+    TRACE_SAMPLE_RATE: float = 1.0  # fraction of traces exported
     
     # Usage
     API_KEY: str 
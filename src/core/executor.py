@@ -0,0 +1,46 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from src.core.config import get_settings
+
+settings = get_settings()
+
+# Bounded pool for blocking work (Chroma, file I/O, text extraction) so it never runs on the event loop
+blocking_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_EXECUTOR_WORKERS,
+    thread_name_prefix="blocking"
+)
+
+
+# CPU-bound work (text extraction) runs in worker processes, created on first use
+_process_executor: Optional[ProcessPoolExecutor] = None
+_process_executor_lock = threading.Lock()
+
+
+def get_process_executor() -> ProcessPoolExecutor:
+    """Get the shared process pool for CPU-bound work"""
+    global _process_executor
+    with _process_executor_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(max_workers=settings.EXTRACTION_PROCESSES)
+        return _process_executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable in the bounded executor, keeping the caller's context"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        blocking_executor, functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def shutdown_executors():
+    """Stop executor threads (called on application shutdown)"""
+    blocking_executor.shutdown(wait=False, cancel_futures=True)
+    if _process_executor is not None:
+        _process_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,26 +1,43 @@
 import logging
 import sys
 
+from src.core.metrics import observe_stage
+
+# Attributes every LogRecord has; anything else came in through extra=
+RESERVED_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+class ExtraFormatter(logging.Formatter):
+    """Formatter that appends extra= fields as key=value pairs"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        extras = {key: value for key, value in record.__dict__.items() if key not in RESERVED_ATTRS}
+        if extras:
+            message += " " + " ".join(f"{key}={value}" for key, value in extras.items())
+        return message
+
+
 def setup_logging():
     """Configure structure"""
-    
+
     logger = logging.getLogger("document-qa")
     logger.setLevel(logging.INFO)
-    
+
     logger.handlers = []
-    
+
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    
-    formatter = logging.Formatter(
+
+    formatter = ExtraFormatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
+
     console_handler.setFormatter(formatter)
-    
+
     logger.addHandler(console_handler)
-    
+
     return logger
 
 logger = setup_logging()
@@ -28,12 +45,12 @@ logger = setup_logging()
 def log_request(endpoint: str, method: str, **kwargs):
     """Log API request"""
     logger.info(f"Request: {method} {endpoint}", extra=kwargs)
-    
+
 def log_error(error: Exception, context: str = ""):
     """Log error with context"""
     logger.error(f"Error in {context}: {str(error)}", exc_info=True)
-    
+
 def log_performance(operation:str, duration:float, **kwargs):
-    """Log performance metrics"""
+    """Log performance metrics and record the duration in the stage histogram"""
+    observe_stage(operation, duration)
     logger.info(f"Performance: {operation} took {duration:.2f}s" ,extra=kwargs)
-    
\ No newline at end of file
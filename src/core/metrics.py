@@ -0,0 +1,113 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily
+
+from src.core.tracing import span
+
+# Pipeline stages span sub-millisecond cache lookups to multi-minute ingestions
+STAGE_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Latency of pipeline stages",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+STAGE_ERRORS = Counter(
+    "rag_stage_errors_total",
+    "Pipeline stages that raised",
+    ["stage"]
+)
+
+TOKENS = Counter(
+    "rag_tokens_total",
+    "Tokens sent to or received from models",
+    ["kind"]
+)
+
+CHUNKS = Counter(
+    "rag_chunks_total",
+    "Document chunks processed",
+    ["operation"]
+)
+
+HTTP_IN_FLIGHT = Gauge(
+    "rag_http_requests_in_flight",
+    "HTTP requests currently being handled"
+)
+
+HTTP_LATENCY = Histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=STAGE_BUCKETS
+)
+
+INGESTION_BACKLOG = Gauge(
+    "rag_ingestion_backlog",
+    "Ingestion jobs submitted but not finished"
+)
+
+CHAT_HISTORY_BACKLOG = Gauge(
+    "rag_chat_history_backlog",
+    "Chat history rows queued for a bulk insert"
+)
+
+
+class CacheCollector:
+    """Exports hit/miss counters of registered caches, read only at scrape time"""
+
+    def __init__(self):
+        self._caches: Dict[str, object] = {}
+
+    def register(self, name: str, cache):
+        """Track a cache exposing `hits` and `misses` attributes"""
+        self._caches[name] = cache
+
+    def collect(self):
+        family = CounterMetricFamily("rag_cache_requests", "Cache lookups by result", labels=["cache", "result"])
+        for name, cache in self._caches.items():
+            family.add_metric([name, "hit"], cache.hits)
+            family.add_metric([name, "miss"], cache.misses)
+        yield family
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def observe_stage(stage: str, duration: float):
+    """Record a completed stage"""
+    STAGE_LATENCY.labels(stage).observe(duration)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time a block as a pipeline stage (and a span of the current trace), counting it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Serialize the registry in the Prometheus text format, returning (body, content type)"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def record_llm_usage(usage: Optional[Dict]):
+    """Count prompt and completion tokens from a LangChain usage_metadata dict"""
+    if usage:
+        TOKENS.labels("prompt").inc(usage.get("input_tokens", 0))
+        TOKENS.labels("completion").inc(usage.get("output_tokens", 0))
@@ -0,0 +1,67 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Select, tuple_
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a page cursor cannot be decoded"""
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    """Opaque token for the position after a row in (created_at, id) order"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(payload)
+        return datetime.fromisoformat(created_at), str(row_id)
+    except Exception:
+        raise InvalidCursorError("Invalid cursor")
+
+
+def keyset_page(stmt: Select, created_at, row_id, cursor: Optional[str], limit: int) -> Select:
+    """Order a query newest first by (created_at, id), starting after the cursor
+
+    One extra row is fetched so `split_page` can tell whether another page follows.
+    """
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(created_at, row_id) < tuple_(after_created_at, after_id))
+    return stmt.order_by(created_at.desc(), row_id.desc()).limit(limit + 1)
+
+
+def split_page(rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row of a keyset query and return the cursor for the next page"""
+    if limit < 1:
+        # An empty page has no row to continue after
+        return [], None
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def page_etag(versions: Iterable) -> str:
+    """Weak ETag over the identity and version of every row on a page"""
+    digest = hashlib.sha256()
+    for version in versions:
+        digest.update(str(version).encode("utf-8"))
+        digest.update(b"\0")
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names the ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in if_none_match.split(","))
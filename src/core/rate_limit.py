@@ -1,9 +1,257 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import hashlib
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple
 
+from fastapi import HTTPException, Request
 
-# สร้าง limiter
-limiter = Limiter(
-    key_func= get_remote_address,
-    default_limits=["100/hr"]
-)
\ No newline at end of file
+from src.core.config import Settings, get_settings
+from src.core.logging import logger
+
+# "10/minute", "100/hr", "5 per second"
+RATE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d*)\s*([a-z]+)\s*$")
+
+PERIODS = {
+    "s": 1, "sec": 1, "second": 1, "seconds": 1,
+    "m": 60, "min": 60, "minute": 60, "minutes": 60,
+    "h": 3600, "hr": 3600, "hour": 3600, "hours": 3600,
+    "d": 86400, "day": 86400, "days": 86400,
+}
+
+# Shared bucket table slot: key digest, tokens, last refill time (unix seconds)
+SLOT = struct.Struct("<16sdd")
+
+# Slots searched for a key before the stalest of them is reused
+PROBE_SLOTS = 8
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """Parse "10/minute" into a bucket capacity and a refill rate in tokens per second"""
+    match = RATE_PATTERN.match(rate.lower())
+    if not match or match.group(3) not in PERIODS:
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+
+    capacity = int(match.group(1))
+    period = int(match.group(2) or 1) * PERIODS[match.group(3)]
+    return capacity, capacity / period
+
+
+def refill(tokens: float, last: float, now: float, capacity: int, rate: float) -> Tuple[bool, float]:
+    """Token bucket step: refill since `last`, then take one token if there is one"""
+    tokens = min(capacity, tokens + max(0.0, now - last) * rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+class MemoryBucketStore:
+    """Token buckets in this process only (one worker)"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        now = time.time()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (capacity, now))
+            allowed, tokens = refill(tokens, last, now, capacity, rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class SharedBucketStore:
+    """Token buckets in a memory-mapped table shared by every worker on the host
+
+    Keys hash to a window of PROBE_SLOTS slots; a key missing from its window
+    takes an empty slot or the one refilled longest ago. Every check is one
+    lock, a few slot reads and one write, so it runs inline on the event loop.
+    """
+
+    def __init__(self, path: str, slots: int):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        size = slots * SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            # Only ever grown: shrinking would fault workers that still map the old size
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+
+    async def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        now = time.time()
+
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                slot = None
+                stalest = None
+                for probe in range(PROBE_SLOTS):
+                    index = (start + probe) % self.slots
+                    slot_digest, tokens, last = SLOT.unpack_from(self._map, index * SLOT.size)
+                    if slot_digest == digest:
+                        slot = index
+                        break
+                    if stalest is None or last < stalest[1]:
+                        stalest = (index, last)
+
+                if slot is None:
+                    # Empty slots have last == 0, so they are the stalest
+                    slot, tokens, last = stalest[0], capacity, now
+
+                allowed, tokens = refill(tokens, last, now, capacity, rate)
+                SLOT.pack_into(self._map, slot * SLOT.size, digest, tokens, now)
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        return allowed, tokens
+
+
+class RedisBucketStore:
+    """Token buckets in Redis (or any server speaking its protocol), shared across hosts"""
+
+    def __init__(self, url: str, prefix: str = "rate-limit:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(keys=[self.prefix + key], args=[capacity, rate])
+        return bool(allowed), float(tokens)
+
+
+def default_shared_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "document-qa-rate-limit")
+
+
+def create_bucket_store(settings: Settings):
+    """Build the configured token bucket backend"""
+    backend = settings.RATE_LIMIT_BACKEND
+
+    if backend == "memory":
+        return MemoryBucketStore(max_keys=settings.RATE_LIMIT_SLOTS)
+
+    if backend == "shared":
+        return SharedBucketStore(settings.RATE_LIMIT_SHARED_PATH or default_shared_path(), settings.RATE_LIMIT_SLOTS)
+
+    if backend == "redis":
+        if not settings.RATE_LIMIT_REDIS_URL:
+            raise ValueError("RATE_LIMIT_BACKEND=redis requires RATE_LIMIT_REDIS_URL")
+        return RedisBucketStore(settings.RATE_LIMIT_REDIS_URL)
+
+    raise ValueError(f"Unsupported rate limit backend: {backend}")
+
+
+class RateLimiter:
+    """Per-route token bucket limits, keyed by API key (or client address)
+
+    `limit` only records the rate on the endpoint; the limiter itself is an
+    app-wide dependency that checks the matched route's bucket once per
+    request.
+    """
+
+    def __init__(self, key_by: str = "api_key", enabled: bool = True):
+        if key_by not in ("api_key", "address"):
+            raise ValueError(f"Unsupported rate limit key: {key_by}")
+        self.key_by = key_by
+        self.enabled = enabled
+        self._store = None
+
+    def start(self):
+        """Open the bucket store; called at startup so a misconfigured backend fails fast"""
+        if self.enabled and self._store is None:
+            settings = get_settings()
+            self._store = create_bucket_store(settings)
+            logger.info(f"Rate limiter started ({settings.RATE_LIMIT_BACKEND} backend, keyed by {self.key_by})")
+
+    def limit(self, rate: str) -> Callable:
+        """Declare the rate of an endpoint, e.g. @limiter.limit("10/minute")"""
+        capacity, per_second = parse_rate(rate)
+
+        def decorator(endpoint: Callable) -> Callable:
+            endpoint.__rate_limit__ = (rate, capacity, per_second)
+            return endpoint
+
+        return decorator
+
+    def request_key(self, request: Request) -> str:
+        api_key = request.headers.get("X-API-Key") if self.key_by == "api_key" else None
+        if api_key:
+            # Keys are stored hashed so the table never holds credentials
+            return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+        return "addr:" + (request.client.host if request.client else "unknown")
+
+    async def __call__(self, request: Request):
+        route = request.scope.get("route")
+        declared = getattr(getattr(route, "endpoint", None), "__rate_limit__", None)
+        if not self.enabled or declared is None:
+            return
+
+        if self._store is None:
+            self.start()
+
+        rate, capacity, per_second = declared
+        key = f"{self.request_key(request)}:{request.method}:{route.path}"
+        try:
+            allowed, tokens = await self._store.take(key, capacity, per_second)
+        except Exception as e:
+            # A limiter outage must not take the API down with it
+            logger.error(f"Rate limit check failed, allowing request: {str(e)}")
+            return
+
+        if not allowed:
+            retry_after = max(1, int((1 - tokens) / per_second + 0.999))
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded: {rate}",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+
+limiter = RateLimiter(
+    key_by=get_settings().RATE_LIMIT_KEY,
+    enabled=get_settings().RATE_LIMIT_ENABLED
+)
@@ -0,0 +1,30 @@
+from typing import Optional
+
+import tiktoken
+
+from src.core.logging import logger
+
+
+def load_encoding(model: Optional[str]) -> Optional[tiktoken.Encoding]:
+    """tiktoken encoding of a model (cl100k_base for models tiktoken does not know)
+
+    Returns None when there is no model or the encoding cannot be loaded;
+    encodings are downloaded on first use, so this is the case on offline hosts.
+    """
+    if model is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.error(f"Could not load tiktoken encoding for {model}, estimating token counts: {str(e)}")
+        return None
+
+
+def count_tokens(encoding: Optional[tiktoken.Encoding], text: str) -> int:
+    """Count tokens of a text, estimating about four characters per token without an encoding"""
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
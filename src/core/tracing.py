@@ -0,0 +1,255 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from src.core.config import get_settings
+
+settings = get_settings()
+
+# Imported by src.core.logging (through metrics), so use the logger directly
+logger = logging.getLogger("document-qa")
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# Spans beyond this are counted but not kept, so a huge ingestion cannot grow a trace without bound
+MAX_SPANS_PER_TRACE = 2000
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.span_id = random.getrandbits(64).to_bytes(8, "big").hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    """Spans collected for one request or background job"""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes):
+        self.trace_id = trace_id or random.getrandbits(128).to_bytes(16, "big").hex()
+        self.root = Span(name, parent_id, attributes)
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def timings(self) -> "OrderedDict[str, float]":
+        """Total milliseconds per span name, in first-seen order, plus the root as `total`"""
+        totals: "OrderedDict[str, float]" = OrderedDict()
+        with self._lock:
+            for span in self.spans:
+                if span.end_ns is not None:
+                    totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        totals["total"] = self.root.duration_ms
+        return totals
+
+    def server_timing(self) -> str:
+        """Format the timings as a Server-Timing header value"""
+        return ", ".join(
+            f"{re.sub(r'[^A-Za-z0-9_-]', '_', name)};dur={duration:.1f}"
+            for name, duration in self.timings().items()
+        )
+
+    def to_otlp(self) -> Dict:
+        """Serialize as an OTLP/JSON ExportTraceServiceRequest"""
+        with self._lock:
+            spans = [self.root] + list(self.spans)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", settings.PROJECT_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "document-qa"},
+                    "spans": [self._otlp_span(span) for span in spans]
+                }]
+            }]
+        }
+
+    def _otlp_span(self, span: Span) -> Dict:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SERVER for the root, INTERNAL for stages
+            "kind": 2 if span is self.root else 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or time.time_ns()),
+            "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        return data
+
+
+def _attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the running request or job, if any"""
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Trace]:
+    """Collect spans for a request or job; exported on exit when an exporter is configured
+
+    A W3C traceparent header continues the caller's trace.
+    """
+    trace_id = parent_id = None
+    match = TRACEPARENT_PATTERN.match(traceparent or "")
+    if match:
+        trace_id, parent_id = match.groups()
+
+    trace = Trace(name, trace_id=trace_id, parent_id=parent_id, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.error = str(e)
+        raise
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        exporter.export(trace)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Time a block as a child of the current span; a no-op outside a trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+
+    try:
+        yield current
+    except Exception as e:
+        current.error = str(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # An async generator closed from another context (e.g. a cancelled stream)
+            pass
+        trace.add(current)
+
+
+class TraceExporter:
+    """Writes finished traces as OTLP/JSON to a file (one per line) and/or an OTLP/HTTP collector
+
+    Export runs on a single background thread; when it falls behind, traces
+    are dropped rather than delaying requests.
+    """
+
+    def __init__(self, path: Optional[str], endpoint: Optional[str], sample_rate: float, max_pending: int = 1000):
+        self.path = path
+        self.endpoint = endpoint
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.dropped = 0
+
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        if path or endpoint:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+            if path and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def export(self, trace: Trace):
+        if self._executor is None or random.random() >= self.sample_rate:
+            return
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+
+        self._executor.submit(self._write, trace)
+
+    def shutdown(self):
+        """Flush queued traces"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _write(self, trace: Trace):
+        try:
+            body = json.dumps(trace.to_otlp())
+
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+
+            if self.endpoint:
+                request = urllib.request.Request(
+                    self.endpoint, data=body.encode("utf-8"), headers={"Content-Type": "application/json"}
+                )
+                with urllib.request.urlopen(request, timeout=5):
+                    pass
+
+        except Exception as e:
+            logger.error(f"Error exporting trace {trace.trace_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+exporter = TraceExporter(
+    path=settings.TRACE_EXPORT_PATH,
+    endpoint=settings.TRACE_EXPORT_ENDPOINT,
+    sample_rate=settings.TRACE_SAMPLE_RATE
+)
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from sqlalchemy import DateTime, create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from src.core.config import get_settings
@@ -6,6 +8,23 @@ from src.core.config import get_settings
 
 settings = get_settings()
 
+# Async drivers used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Derive an async driver URL from the sync DATABASE_URL"""
+    url = make_url(database_url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url.render_as_string(hide_password=False)
+
+
 # Create engine
 engine = create_engine(
     settings.DATABASE_URL,
@@ -16,6 +35,15 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for request handlers
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL),
+    pool_pre_ping=True,
+    echo=settings.DEBUG
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base class form models
 Base = declarative_base()
 
@@ -27,7 +55,42 @@ def get_db():
     finally:
         db.close()
         
+async def get_async_db():
+    """Dependency for getting an async DB session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+        
 def init_db():
-    """Initialize database (create tables)"""
+    """Initialize database (create tables, columns and indexes)"""
     Base.metadata.create_all(bind=engine)
+    
+    # create_all skips tables that already exist, so nullable columns and indexes added to a model later are created here
+    existing = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in existing.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns and column.nullable:
+                column_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as connection:
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    
+    if engine.dialect.name == "sqlite":
+        normalize_sqlite_datetimes()
+        
+def normalize_sqlite_datetimes():
+    """Rewrite 'YYYY-MM-DD HH:MM:SS' values from server_default=func.now() in the format SQLAlchemy binds
+    
+    SQLite compares datetimes as text, and the short form sorts before the
+    '.000000' form of the same instant, so a keyset cursor would match its own row.
+    """
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for column in table.columns:
+                if isinstance(column.type, DateTime):
+                    connection.execute(text(
+                        f"UPDATE {table.name} SET {column.name} = {column.name} || '.000000' "
+                        f"WHERE length({column.name}) = 19"
+                    ))
         
\ No newline at end of file
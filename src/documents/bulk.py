@@ -0,0 +1,326 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from sqlalchemy.orm import Session
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple
+import os
+import tarfile
+import time
+import uuid
+import zipfile
+
+from src.documents.models import Document
+from src.documents.service import document_service, chunk_hash, SUPPORTED_EXTENSIONS, UploadTooLargeError
+from src.vector_store.client import vector_store
+from src.vector_store.batching import embedding_scheduler, EmbeddingSession
+from src.chat.cache import answer_cache
+from src.core.config import get_settings
+from src.core.logging import logger, log_performance
+from src.core.metrics import CHUNKS, track_stage
+
+
+settings = get_settings()
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def archive_extension(file_name: str) -> Optional[str]:
+    """Return the archive extension of a file name, or None if it is not an archive"""
+    lower = file_name.lower()
+    for extension in sorted(ARCHIVE_EXTENSIONS, key=len, reverse=True):
+        if lower.endswith(extension):
+            return extension
+    return None
+
+
+def iter_archive(path: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """Yield (entry name, stream) for each regular file of a ZIP or TAR archive, one entry at a time"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as stream:
+                    yield info.filename, stream
+        return
+
+    # Stream mode reads members in order without an index or seeking back
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            stream = archive.extractfile(member)
+            if stream is not None:
+                yield member.name, stream
+
+
+class BulkIngestion:
+    """Ingests many files through one shared embedding session (blocking; runs as a background job)
+
+    Files are extracted and split on a small prefetch pool while the chunks of
+    earlier files are embedded, and embedding batches span file boundaries.
+    Documents are committed in groups once all of their chunks are stored; a
+    failed group is rolled back without affecting the others. Their ids are
+    reserved in the job progress before any vector is written, so garbage
+    collection does not take the vectors of uncommitted documents for orphans.
+    """
+
+    def __init__(self, db: Session, progress: Optional[Callable[..., None]] = None):
+        self.db = db
+        self.progress = progress or (lambda **counters: None)
+        self.results: List[Dict] = []
+        self.embedded = 0
+
+        self._seen_hashes: Dict[str, str] = {}
+        self._reserved: "deque[str]" = deque()
+        self._uncommitted: Set[str] = set()
+        self._last_report = 0.0
+
+    def run(self, items: List[Dict]) -> Dict:
+        """Ingest uploaded files and archives, returning per-file results"""
+        start_time = time.time()
+        files = self._iter_files(items)
+        pending: "deque[Tuple[Dict, Optional[Future]]]" = deque()
+        wave: List[Dict] = []
+        session = embedding_scheduler.session()
+
+        with ThreadPoolExecutor(max_workers=settings.BULK_PREFETCH_FILES, thread_name_prefix="bulk-prepare") as pool:
+            def submit_next():
+                entry = next(files, None)
+                if entry is not None:
+                    ready = "status" not in entry and not self._is_duplicate(entry)
+                    pending.append((entry, pool.submit(self._prepare, entry) if ready else None))
+
+            try:
+                for _ in range(settings.BULK_PREFETCH_FILES):
+                    submit_next()
+
+                while pending:
+                    entry, future = pending.popleft()
+                    submit_next()
+
+                    if future is None:
+                        self._record(entry)
+                        continue
+
+                    try:
+                        chunks, file_metadata = future.result()
+                    except Exception as e:
+                        self._fail(entry, e)
+                        continue
+
+                    wave.append(self._add(session, entry, chunks, file_metadata))
+
+                    if session.error is not None or len(wave) >= settings.BULK_COMMIT_FILES:
+                        self._commit(session, wave)
+                        session, wave = embedding_scheduler.session(), []
+
+                self._commit(session, wave)
+
+            except Exception:
+                for _, future in pending:
+                    if future is not None:
+                        future.cancel()
+                session.abort()
+                self._discard(wave)
+                raise
+
+            finally:
+                # Kept until now so a job interrupted by a restart can read its archives again
+                for item in items:
+                    if item["type"] == "archive" and os.path.exists(item["file_path"]):
+                        os.remove(item["file_path"])
+
+        summary = {
+            "files": self.results,
+            "indexed": sum(1 for result in self.results if result["status"] == "indexed"),
+            "duplicates": sum(1 for result in self.results if result["status"] == "duplicate"),
+            "failed": sum(1 for result in self.results if result["status"] == "failed"),
+            "skipped": sum(1 for result in self.results if result["status"] == "skipped"),
+            "chunks_created": sum(result.get("chunks", 0) for result in self.results),
+            "processing_time": time.time() - start_time
+        }
+        log_performance("bulk_ingestion", summary["processing_time"], files=len(self.results))
+        return summary
+
+    def _iter_files(self, items: List[Dict]) -> Iterator[Dict]:
+        """Yield saved files in order, copying archive entries to UPLOAD_DIR one at a time
+
+        Each entry is copied to a path derived from the archive and its position,
+        so a resumed job overwrites the copies of its interrupted run and finds
+        the entries that run already indexed.
+        """
+        count = 0
+        for item in items:
+            if item["type"] != "archive":
+                count += 1
+                yield dict(item)
+                continue
+
+            try:
+                for position, (name, stream) in enumerate(iter_archive(item["file_path"])):
+                    count += 1
+                    if count > settings.BULK_MAX_FILES:
+                        yield {"name": item["name"], "status": "failed",
+                               "error": f"More than {settings.BULK_MAX_FILES} files, remaining entries skipped"}
+                        break
+                    entry_id = uuid.uuid5(uuid.NAMESPACE_URL, f"{item['file_path']}#{position}")
+                    yield self._save_entry(f"{item['name']}/{name}", stream, entry_id)
+
+            except (tarfile.TarError, zipfile.BadZipFile, OSError) as e:
+                yield {"name": item["name"], "status": "failed", "error": f"Could not read archive: {str(e)}"}
+
+    def _save_entry(self, name: str, stream: BinaryIO, entry_id: uuid.UUID) -> Dict:
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in SUPPORTED_EXTENSIONS:
+            return {"name": name, "status": "skipped", "error": "File type not supported"}
+
+        file_path = os.path.join(settings.UPLOAD_DIR, f"{entry_id}{extension}")
+        try:
+            size, content_hash = document_service.save_upload(stream, file_path)
+        except UploadTooLargeError as e:
+            return {"name": name, "status": "failed", "error": str(e)}
+
+        if size == 0:
+            os.remove(file_path)
+            return {"name": name, "status": "failed", "error": "File is empty"}
+
+        return {"name": name, "file_path": file_path, "content_hash": content_hash}
+
+    def _is_duplicate(self, entry: Dict) -> bool:
+        """Mark entries whose content is already indexed or earlier in this job"""
+        content_hash = entry["content_hash"]
+        existing = self._seen_hashes.get(content_hash)
+        if existing is None:
+            row = self.db.query(Document.id, Document.file_path).filter(Document.content_hash == content_hash).first()
+            if row is not None:
+                existing = row.id
+                if row.file_path == entry["file_path"]:
+                    # Indexed by an earlier run of this job that was interrupted
+                    entry.update(status="indexed", document_id=row.id)
+                    return True
+
+        if existing is None:
+            self._seen_hashes[content_hash] = ""
+            return False
+
+        os.remove(entry["file_path"])
+        entry.update(status="duplicate", document_id=existing or None)
+        return True
+
+    def _prepare(self, entry: Dict) -> Tuple[List[str], Dict]:
+        with track_stage("prepare_document"):
+            return document_service.prepare_document(entry["file_path"])
+
+    def _add(self, session: EmbeddingSession, entry: Dict, chunks: List[str], file_metadata: Dict) -> Dict:
+        """Queue a file's chunks on the shared session"""
+        document_id = self._reserve_document_id()
+        title = os.path.splitext(os.path.basename(entry["name"]))[0]
+        self._seen_hashes[entry["content_hash"]] = document_id
+        pending_file = {**entry, "document_id": document_id, "title": title, "metadata": file_metadata, "chunk_ids": []}
+
+        # Whole files are split before embedding, so total_chunks is known up front
+        for chunk_index, chunk in enumerate(chunks):
+            if session.error is not None:
+                break
+            pending_file["chunk_ids"].append(
+                session.add(chunk, document_service.chunk_metadata(
+                    document_id, title, chunk_index, len(chunks), chunk_hash(chunk)
+                ))
+            )
+
+        self._report(session)
+        return pending_file
+
+    def _reserve_document_id(self) -> str:
+        """Take a document id recorded in the job progress, reserving a new group of ids when none is left"""
+        if not self._reserved:
+            document_ids = [str(uuid.uuid4()) for _ in range(settings.BULK_COMMIT_FILES)]
+            self._reserved.extend(document_ids)
+            self._uncommitted.update(document_ids)
+            self.progress(reserved_document_ids=sorted(self._uncommitted))
+        return self._reserved.popleft()
+
+    def _commit(self, session: EmbeddingSession, wave: List[Dict]):
+        """Wait for a group's chunks, then create its documents in one transaction"""
+        if not wave:
+            return
+
+        try:
+            session.flush()
+            self.embedded += session.embedded
+
+            for pending_file in wave:
+                self.db.add(Document(
+                    id=pending_file["document_id"],
+                    title=pending_file["title"],
+                    description="",
+                    file_name=os.path.basename(pending_file["name"]),
+                    file_path=pending_file["file_path"],
+                    file_size=pending_file["metadata"]["file_size"],
+                    page_count=pending_file["metadata"]["page_count"],
+                    chunk_count=len(pending_file["chunk_ids"]),
+                    content_hash=pending_file["content_hash"]
+                ))
+            with track_stage("db_commit"):
+                self.db.commit()
+
+        except Exception as e:
+            logger.error(f"Bulk ingestion group of {len(wave)} files failed: {str(e)}")
+            self.db.rollback()
+            session.abort()
+            self._discard(wave, e)
+            return
+
+        document_ids = [pending_file["document_id"] for pending_file in wave]
+        self._uncommitted.difference_update(document_ids)
+        answer_cache.invalidate_documents(document_ids, include_unscoped=True)
+        CHUNKS.labels("ingested").inc(sum(len(pending_file["chunk_ids"]) for pending_file in wave))
+
+        for pending_file in wave:
+            self._record({
+                "name": pending_file["name"],
+                "status": "indexed",
+                "document_id": pending_file["document_id"],
+                "chunks": len(pending_file["chunk_ids"])
+            })
+        self._report(force=True)
+
+    def _discard(self, wave: List[Dict], error: Optional[Exception] = None):
+        """Drop the vectors and files of a group that could not be committed"""
+        if not wave:
+            return
+
+        document_ids = [pending_file["document_id"] for pending_file in wave]
+        try:
+            vector_store.delete_by_document_ids(document_ids)
+            self._uncommitted.difference_update(document_ids)
+        except Exception as cleanup_error:
+            # Still reserved, so garbage collection removes the vectors once the job is over
+            logger.error(f"Error cleaning up vectors of a failed bulk group: {str(cleanup_error)}")
+
+        for pending_file in wave:
+            self._seen_hashes.pop(pending_file["content_hash"], None)
+            if error is not None:
+                self._fail(pending_file, error)
+
+    def _fail(self, entry: Dict, error: Exception):
+        if entry.get("file_path") and os.path.exists(entry["file_path"]):
+            os.remove(entry["file_path"])
+        self._record({"name": entry["name"], "status": "failed", "error": str(error)})
+
+    def _record(self, entry: Dict):
+        self.results.append({
+            key: entry[key] for key in ("name", "status", "document_id", "chunks", "error") if key in entry
+        })
+        self._report()
+
+    def _report(self, session: Optional[EmbeddingSession] = None, force: bool = False):
+        if not force and time.time() - self._last_report < settings.INGESTION_PROGRESS_INTERVAL:
+            return
+
+        self._last_report = time.time()
+        self.progress(
+            files_done=len(self.results),
+            files_failed=sum(1 for result in self.results if result["status"] == "failed"),
+            chunks_embedded=self.embedded + (session.embedded if session is not None else 0)
+        )
@@ -0,0 +1,319 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+import asyncio
+import json
+import os
+import socket
+import threading
+import uuid
+
+from src.documents.models import ACTIVE_STATUSES, Document, Job
+from src.documents.service import document_service
+from src.documents.bulk import BulkIngestion
+from src.database import SessionLocal, AsyncSessionLocal
+from src.vector_store.client import vector_store
+from src.core.config import get_settings
+from src.core.logging import logger, log_error
+from src.core.tracing import current_trace, start_trace
+
+
+settings = get_settings()
+
+
+class IngestionQueue:
+    """Bounded worker pool running persisted background jobs (ingestion, bulk delete, garbage collection)"""
+
+    def __init__(self, max_workers: int, lease_seconds: float):
+        self.max_workers = max_workers
+        self.lease_seconds = lease_seconds
+        self.owner: Optional[str] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start workers and resume queued jobs and running jobs whose worker is gone
+
+        A running job is owned by the process that claimed it, which renews the
+        job's lease every third of JOB_LEASE_SECONDS. Only jobs whose lease
+        expired are taken over, so jobs of other live workers are left alone.
+        """
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingestion")
+
+        reclaimed = self._reclaim_expired()
+        with SessionLocal() as db:
+            job_ids = [job_id for (job_id,) in db.query(Job.id).filter(Job.status == "queued").order_by(Job.created_at)]
+
+        # Claiming is atomic, so a queued job another worker also picked up still runs once
+        for job_id in job_ids:
+            self.submit(job_id)
+
+        self._stopping.clear()
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="ingestion-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+        logger.info(
+            f"Ingestion workers started ({self.max_workers}), resumed {len(job_ids)} jobs "
+            f"({len(reclaimed)} reclaimed from expired leases)"
+        )
+
+    def stop(self):
+        """Stop accepting work; unfinished jobs resume once their lease expires"""
+        self._stopping.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _renew_leases(self):
+        """Renew the leases of this worker's jobs and take over jobs of workers that stopped renewing theirs"""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                with SessionLocal() as db:
+                    db.execute(
+                        update(Job).where(Job.owner == self.owner, Job.status == "running")
+                        .values(heartbeat_at=utcnow())
+                    )
+                    db.commit()
+
+                for job_id in self._reclaim_expired():
+                    self.submit(job_id)
+            except Exception as e:
+                log_error(e, "ingestion job heartbeat")
+
+    def _reclaim_expired(self) -> List[str]:
+        """Requeue running jobs whose lease expired (their worker crashed or was stopped)"""
+        # Jobs claimed before leases were recorded have no heartbeat and count as expired
+        expired = and_(
+            Job.status == "running",
+            or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < utcnow() - timedelta(seconds=self.lease_seconds))
+        )
+        with SessionLocal() as db:
+            job_ids = [job_id for (job_id,) in db.query(Job.id).filter(expired)]
+            if job_ids:
+                db.execute(update(Job).where(Job.id.in_(job_ids), expired).values(status="queued", owner=None))
+                db.commit()
+
+        if job_ids:
+            logger.warning(f"Requeued {len(job_ids)} running jobs whose worker lease expired")
+        return job_ids
+
+    @property
+    def backlog(self) -> int:
+        """Number of submitted jobs not yet finished"""
+        return self._pending
+
+    async def enqueue_upload(self, file_path: str, title: str, description: str, db: AsyncSession,
+                             content_hash: Optional[str] = None) -> Job:
+        """Persist an ingestion job for an uploaded file and schedule it"""
+        job = Job(
+            kind="ingestion",
+            document_id=str(uuid.uuid4()),
+            file_path=file_path,
+            content_hash=content_hash,
+            payload=json.dumps({"title": title, "description": description})
+        )
+        return await self._enqueue(job, db)
+
+    async def enqueue_update(self, document_id: str, file_path: str, content_hash: str, db: AsyncSession,
+                             title: Optional[str] = None, description: Optional[str] = None) -> Job:
+        """Persist a re-indexing job for a new version of a document and schedule it"""
+        job = Job(
+            kind="update",
+            document_id=document_id,
+            file_path=file_path,
+            content_hash=content_hash,
+            payload=json.dumps({"title": title, "description": description})
+        )
+        return await self._enqueue(job, db)
+
+    async def find_document_job(self, document_id: str, db: AsyncSession) -> Optional[Job]:
+        """Find a queued or running job that writes to a document"""
+        result = await db.execute(
+            select(Job).where(
+                Job.kind.in_(("ingestion", "update")),
+                Job.document_id == document_id,
+                Job.status.in_(ACTIVE_STATUSES)
+            ).limit(1)
+        )
+        return result.scalars().first()
+
+    async def enqueue_bulk_upload(self, items: List[Dict], db: AsyncSession) -> Job:
+        """Persist a bulk ingestion job for saved files and archives and schedule it"""
+        job = Job(kind="bulk_ingestion", payload=json.dumps({"items": items}))
+        return await self._enqueue(job, db)
+
+    async def enqueue_delete(self, document_ids: List[str], db: AsyncSession) -> Job:
+        """Persist a bulk delete job and schedule it"""
+        job = Job(kind="delete", payload=json.dumps({"document_ids": document_ids}))
+        return await self._enqueue(job, db)
+
+    async def enqueue_gc(self, db: AsyncSession) -> Job:
+        """Schedule garbage collection, reusing a collection that is already pending"""
+        result = await db.execute(select(Job).where(Job.kind == "gc", Job.status.in_(ACTIVE_STATUSES)).limit(1))
+        active = result.scalars().first()
+        if active is not None:
+            return active
+
+        return await self._enqueue(Job(kind="gc"), db)
+
+    async def _enqueue(self, job: Job, db: AsyncSession) -> Job:
+        job.status = "queued"
+        job.progress = json.dumps({})
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+
+        self.submit(job.id)
+        return job
+
+    async def find_active_job(self, content_hash: str, db: AsyncSession) -> Optional[Job]:
+        """Find a queued or running ingestion job for identical file content"""
+        result = await db.execute(
+            select(Job).where(
+                Job.kind == "ingestion",
+                Job.content_hash == content_hash,
+                Job.status.in_(ACTIVE_STATUSES)
+            ).limit(1)
+        )
+        return result.scalars().first()
+
+    def submit(self, job_id: str):
+        """Schedule a persisted job on the worker pool"""
+        if self._executor is None:
+            raise RuntimeError("Ingestion workers are not running")
+
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str):
+        try:
+            # Each job is its own trace; its stage breakdown is stored with the result
+            with start_trace("job", job_id=job_id), SessionLocal() as db:
+                self._run_job(job_id, db)
+        except Exception as e:
+            log_error(e, f"ingestion job {job_id}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _run_job(self, job_id: str, db: Session):
+        # Claim the job so it never runs twice
+        claimed = db.execute(
+            update(Job).where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", owner=self.owner, heartbeat_at=utcnow())
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return
+
+        job = db.get(Job, job_id)
+        kind, file_path = job.kind, job.file_path
+        payload = json.loads(job.payload or "{}")
+
+        def report(**counters):
+            progress = json.loads(job.progress or "{}")
+            progress.update(counters)
+            job.progress = json.dumps(progress)
+            db.commit()
+
+        try:
+            with SessionLocal() as work_db:
+                if job.kind == "delete":
+                    result = document_service.delete_documents(payload["document_ids"], work_db, progress=report)
+                elif job.kind == "update":
+                    result = document_service.update_document(
+                        job.document_id, job.file_path, work_db,
+                        title=payload.get("title"),
+                        description=payload.get("description"),
+                        content_hash=job.content_hash,
+                        progress=report
+                    )
+                elif job.kind == "bulk_ingestion":
+                    result = BulkIngestion(work_db, progress=report).run(payload["items"])
+                elif job.kind == "gc":
+                    result = document_service.collect_garbage(work_db)
+                else:
+                    result = self._ingest(job, payload, work_db, report)
+
+            trace = current_trace()
+            if trace is not None:
+                result["timings_ms"] = {name: round(ms, 1) for name, ms in trace.timings().items()}
+            self._finish(job, db, result)
+
+        except Exception as e:
+            log_error(e, f"{kind} job {job_id}")
+            try:
+                # A failed progress commit leaves the session unusable until it is rolled back
+                db.rollback()
+                job.status = "failed"
+                job.error = str(e)
+                db.commit()
+            except Exception as status_error:
+                log_error(status_error, f"marking {kind} job {job_id} failed")
+
+            if kind in ("ingestion", "update") and file_path and os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _ingest(self, job: Job, payload: Dict, db: Session, report: Callable[..., None]) -> Dict:
+        if db.get(Document, job.document_id) is not None:
+            # Finished before a restart, only the job status was lost
+            return {"document_id": job.document_id}
+
+        # Vectors written by an interrupted earlier attempt
+        vector_store.delete_by_document_id(job.document_id)
+
+        _, stats = document_service.upload_pdf(
+            file_path=job.file_path,
+            title=payload.get("title", ""),
+            description=payload.get("description", ""),
+            db=db,
+            document_id=job.document_id,
+            progress=report,
+            content_hash=job.content_hash
+        )
+        return stats
+
+    def _finish(self, job: Job, db: Session, result: Dict):
+        job.status = "completed"
+        job.result = json.dumps(result)
+        db.commit()
+        logger.info(f"{job.kind.capitalize()} job completed: {job.id}")
+
+
+ingestion_queue = IngestionQueue(max_workers=settings.INGESTION_WORKERS, lease_seconds=settings.JOB_LEASE_SECONDS)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def run_periodic_gc(interval: float):
+    """Schedule garbage collection every `interval` seconds (runs until cancelled)"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                await ingestion_queue.enqueue_gc(db)
+        except Exception as e:
+            log_error(e, "periodic garbage collection")
+
+
+async def get_job(job_id: str, db: AsyncSession) -> Job:
+    """Get job by ID"""
+    job = await db.get(Job, job_id)
+
+    if not job:
+        raise ValueError(f"Job {job_id} not found")
+
+    return job
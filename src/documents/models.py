@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 from src.database import Base
 import uuid 
 
@@ -18,9 +19,62 @@ class Document(Base):
     file_size = Column(Integer, nullable=False)
     page_count = Column(Integer, nullable=False)
     chunk_count = Column(Integer, default=0)
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the file
+    
+    # Set in-process so the stored value has the same precision and format as keyset cursors
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        # Keyset pagination (newest first) and date range filters
+        Index("ix_documents_created_at_id", "created_at", "id"),
+        # Title prefix filters; the pattern ops let PostgreSQL use it for LIKE 'prefix%'
+        Index("ix_documents_title", "title", postgresql_ops={"title": "varchar_pattern_ops"}),
+    )
+    
+    def __repr__(self):
+        return f"<Document(id={self.id}, title={self.title})>"
+
+
+# Job states that still own their document id and upload file
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class Job(Base):
+    """Background job (e.g. document ingestion) with persisted state and progress"""
+    
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True, default=lambda:str(uuid.uuid4()))
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    document_id = Column(String, nullable=True)
+    file_path = Column(String(512), nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)
+    payload = Column(Text, nullable=True)   # JSON job arguments
+    progress = Column(Text, nullable=True)  # JSON progress counters
+    result = Column(Text, nullable=True)    # JSON result
+    error = Column(Text, nullable=True)
+    owner = Column(String(128), nullable=True)             # worker process running the job
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # lease renewed while it runs
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        # One queued or running ingestion per file content, so concurrent identical uploads cannot both get a job
+        Index(
+            "ux_jobs_active_ingestion_content_hash", "content_hash", unique=True,
+            postgresql_where=(kind == "ingestion") & status.in_(ACTIVE_STATUSES),
+            sqlite_where=(kind == "ingestion") & status.in_(ACTIVE_STATUSES)
+        ),
+        # One queued or running ingestion or update per document, so concurrent updates cannot interleave
+        Index(
+            "ux_jobs_active_document_id", "document_id", unique=True,
+            postgresql_where=kind.in_(("ingestion", "update")) & status.in_(ACTIVE_STATUSES),
+            sqlite_where=kind.in_(("ingestion", "update")) & status.in_(ACTIVE_STATUSES)
+        ),
+    )
+    
     def __repr__(self):
-        return f"<Document(id={self.id}, title={self.title})>"
\ No newline at end of file
+        return f"<Job(id={self.id}, kind={self.kind}, status={self.status})>"
\ No newline at end of file
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
 from typing import List, Optional
 import os
-import shutil
+import uuid
 
-from src.documents.schemas import DocumentResponse, DocumentStats,VectorStoreStats
-from src.documents.service import document_service
-from src.database import get_db
+from src.documents.models import Job
+from src.documents.schemas import DocumentResponse, VectorStoreStats, JobResponse, BulkDeleteRequest
+from src.documents.service import document_service, UploadTooLargeError, SUPPORTED_EXTENSIONS
+from src.documents.jobs import ingestion_queue, get_job
+from src.documents.bulk import archive_extension
+from src.database import get_async_db
 from src.vector_store.client import vector_store
 from src.core.config import get_settings
+from src.core.executor import run_blocking
 from src.core.logging import log_request
+from src.core.pagination import InvalidCursorError, etag_matches, page_etag
 from src.core.rate_limit import limiter
 from src.core.security import verify_api_key
 
@@ -20,6 +28,17 @@ router = APIRouter()
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
 
+def duplicate_job_response(job: Job) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "Identical document is already being indexed",
+            "duplicate": True,
+            "job": JobResponse.model_validate(job).model_dump(mode="json")
+        }
+    )
+
+
 @router.post("/upload" , response_model=dict)
 @limiter.limit("5/minute")
 async def upload_document(
@@ -27,13 +46,13 @@ async def upload_document(
     file: UploadFile = File(...),
     title:str = Form(...),
     description: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Upload and index a document"""
+    """Upload a document and queue it for indexing"""
     log_request("/documents/upload", "POST", file = file.filename, title= title)
     
     # Security Settings
-    allowed_extensions = ['.pdf','.docx','.txt']
+    allowed_extensions = list(SUPPORTED_EXTENSIONS)
     
     # 1. Check file extension
     file_extension = os.path.splitext(file.filename)[1].lower()
@@ -41,40 +60,64 @@ async def upload_document(
     if file_extension not in allowed_extensions:
         raise HTTPException(status_code=400, detail=f"File type not supported. Allowed: {', '.join(allowed_extensions)}")
     
-    # 2. check file size
-    file.file.seek(0,2)
-    file_size = file.file.tell()
-    file.file.seek(0)
+    import uuid
+    unique_id = str(uuid.uuid4())
+    file_name = f"{unique_id}{file_extension}"
+    file_path = os.path.join(settings.UPLOAD_DIR,file_name)
     
-    if file_size > settings.MAX_UPLOAD_SIZE:
+    # 2. Stream to disk, checking the size limit and hashing in the same pass
+    try:
+        file_size, content_hash = await run_blocking(document_service.save_upload, file.file, file_path)
+    except UploadTooLargeError:
         raise HTTPException(
             status_code=400, detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE / (1024*1024):.1f}MB"
         )
         
     if file_size == 0:
+        os.remove(file_path)
         raise HTTPException(status_code=400, detail="File is empty")
         
     try:
-        import uuid
-        unique_id = str(uuid.uuid4())
-        file_name = f"{unique_id}{file_extension}"
-        file_path = os.path.join(settings.UPLOAD_DIR,file_name)
-        
-        with open(file_path, 'wb') as buffer:
-            shutil.copyfileobj(file.file,buffer)
+        # 3. Identical content is indexed (or being indexed) already
+        existing = await document_service.find_by_hash(content_hash, db)
+        if existing is not None:
+            os.remove(file_path)
+            return {
+                "message": "Identical document already indexed, reusing existing embeddings",
+                "duplicate": True,
+                "document": DocumentResponse.model_validate(existing)
+            }
             
-        document, stats = document_service.upload_pdf(
-            file_path= file_path,
-            title = title,
-            description = description or "",
-            db=db
-        )
+        active_job = await ingestion_queue.find_active_job(content_hash, db)
+        if active_job is not None:
+            os.remove(file_path)
+            return duplicate_job_response(active_job)
+            
+        try:
+            job = await ingestion_queue.enqueue_upload(
+                file_path= file_path,
+                title = title,
+                description = description or "",
+                content_hash = content_hash,
+                db=db
+            )
+        except IntegrityError:
+            # An identical upload created its job between the check above and this insert
+            await db.rollback()
+            active_job = await ingestion_queue.find_active_job(content_hash, db)
+            if active_job is None:
+                raise
+            os.remove(file_path)
+            return duplicate_job_response(active_job)
         
-        return {
-            "message": "Document uploaded and indexed successfully",
-            "document" : DocumentResponse.model_validate(document),
-            "stats" : DocumentStats(**stats)
-        }
+        return JSONResponse(
+            status_code=202,
+            content={
+                "message": "Document accepted for indexing",
+                "duplicate": False,
+                "job": JobResponse.model_validate(job).model_dump(mode="json")
+            }
+        )
         
     except Exception as e:
         if os.path.exists(file_path):
@@ -86,17 +129,122 @@ async def upload_document(
         )
         
 
+@router.post("/upload/bulk", response_model=dict)
+@limiter.limit("5/minute")
+async def upload_documents_bulk(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Upload many documents and/or ZIP/TAR archives and queue them for indexing in one job"""
+    log_request("/documents/upload/bulk", "POST", files=len(files))
+    
+    if len(files) > settings.BULK_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Max per request: {settings.BULK_MAX_FILES}")
+    
+    items = []
+    rejected = []
+    
+    try:
+        for file in files:
+            name = file.filename or "unnamed"
+            archive = archive_extension(name)
+            file_extension = archive or os.path.splitext(name)[1].lower()
+            
+            if archive is None and file_extension not in SUPPORTED_EXTENSIONS:
+                rejected.append({"name": name, "error": "File type not supported"})
+                continue
+            
+            file_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{file_extension}")
+            max_size = settings.BULK_MAX_ARCHIVE_SIZE if archive else settings.MAX_UPLOAD_SIZE
+            try:
+                file_size, content_hash = await run_blocking(document_service.save_upload, file.file, file_path, max_size)
+            except UploadTooLargeError as e:
+                rejected.append({"name": name, "error": str(e)})
+                continue
+            
+            if file_size == 0:
+                os.remove(file_path)
+                rejected.append({"name": name, "error": "File is empty"})
+                continue
+            
+            items.append({
+                "type": "archive" if archive else "file",
+                "name": name,
+                "file_path": file_path,
+                "content_hash": content_hash
+            })
+        
+        if not items:
+            raise HTTPException(status_code=400, detail={"message": "No files accepted", "rejected": rejected})
+        
+        job = await ingestion_queue.enqueue_bulk_upload(items, db)
+        
+    except Exception:
+        for item in items:
+            if os.path.exists(item["file_path"]):
+                os.remove(item["file_path"])
+        raise
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": f"{len(items)} uploads accepted for indexing",
+            "rejected": rejected,
+            "job": JobResponse.model_validate(job).model_dump(mode="json")
+        }
+    )
+        
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+@limiter.limit("60/minute")
+async def get_job_status(
+    request: Request,
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the state and progress of a background job"""
+    log_request(f"/documents/jobs/{job_id}", "GET")
+    
+    try:
+        return await get_job(job_id, db)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+        
+
 @router.get("/documents", response_model= List[DocumentResponse])
 @limiter.limit("30/minute")
 async def list_documents(
     request: Request,
-    skip:int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List all documents"""
-    log_request("/documents" , "GET" , skip = skip , limit = limit)
-    documents = document_service.list_documents(db, skip=skip, limit =limit)
+    """List documents newest first; the next page's cursor is in the X-Next-Cursor header"""
+    log_request("/documents" , "GET" , limit = limit, cursor = bool(cursor), title_prefix = title_prefix)
+    
+    try:
+        documents, next_cursor = await document_service.list_documents(
+            db, limit=limit, cursor=cursor, title_prefix=title_prefix,
+            created_after=created_after, created_before=created_before
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    etag = page_etag((document.id, document.updated_at or document.created_at) for document in documents)
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    
+    # An unchanged page is answered without serializing it
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
     return documents
 
 
@@ -105,30 +253,92 @@ async def list_documents(
 async def get_document(
     request : Request,
     document_id : str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get document by ID"""
     log_request(f"/documents/{document_id}","GET")
     
     try:
-        document = document_service.get_document(document_id, db)
+        document = await document_service.get_document(document_id, db)
         return document
     except Exception as e:
         raise HTTPException(status=400, detail=str(e))
     
     
+@router.put("/documents/{document_id}", response_model=dict)
+@limiter.limit("10/minute")
+async def update_document(
+    request: Request,
+    document_id: str,
+    file: UploadFile = File(...),
+    title: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Replace a document's file, re-embedding only chunks whose content changed"""
+    log_request(f"/documents/{document_id}", "PUT", file=file.filename)
+    
+    try:
+        document = await document_service.get_document(document_id, db)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"File type not supported. Allowed: {', '.join(SUPPORTED_EXTENSIONS)}")
+    
+    if await ingestion_queue.find_document_job(document_id, db) is not None:
+        raise HTTPException(status_code=409, detail="Document is already being indexed")
+    
+    file_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{file_extension}")
+    try:
+        file_size, content_hash = await run_blocking(document_service.save_upload, file.file, file_path)
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=400, detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE / (1024*1024):.1f}MB"
+        )
+    
+    if file_size == 0:
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail="File is empty")
+    
+    if content_hash == document.content_hash and title is None and description is None:
+        os.remove(file_path)
+        return {"message": "Document unchanged", "document": DocumentResponse.model_validate(document)}
+    
+    try:
+        job = await ingestion_queue.enqueue_update(
+            document_id, file_path, content_hash, db, title=title, description=description
+        )
+    except IntegrityError:
+        # Another update of this document was queued between the check above and this insert
+        os.remove(file_path)
+        raise HTTPException(status_code=409, detail="Document is already being indexed")
+    except Exception:
+        os.remove(file_path)
+        raise
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "Document update accepted for re-indexing",
+            "job": JobResponse.model_validate(job).model_dump(mode="json")
+        }
+    )
+    
+    
 @router.delete("/documents/{document_id}")
 @limiter.limit("10/minute")
 async def delete_document(
     request: Request,
     document_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a document"""
     log_request(f"/documents/{document_id}", "DELETE")
     
     try:
-        document_service.delete_document(document_id,db)
+        await document_service.delete_document(document_id,db)
         return {
             "message" : "Document deleted successfully",
             "document_id" : document_id
@@ -139,9 +349,40 @@ async def delete_document(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+
+@router.post("/documents/bulk-delete", status_code=202, response_model=JobResponse)
+@limiter.limit("10/minute")
+async def bulk_delete_documents(
+    request: Request,
+    body: BulkDeleteRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete many documents in a background job"""
+    document_ids = list(dict.fromkeys(body.document_ids))
+    log_request("/documents/bulk-delete", "POST", documents=len(document_ids))
+    
+    if len(document_ids) > settings.BULK_DELETE_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400, detail=f"Too many documents. Max per request: {settings.BULK_DELETE_MAX_DOCUMENTS}"
+        )
+    
+    return await ingestion_queue.enqueue_delete(document_ids, db)
+
+
+@router.post("/gc", status_code=202, response_model=JobResponse)
+@limiter.limit("5/minute")
+async def collect_garbage(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Remove vectors and upload files that no longer belong to a document"""
+    log_request("/documents/gc", "POST")
+    return await ingestion_queue.enqueue_gc(db)
+    
+    
 @router.get("/stats", response_model=VectorStoreStats)
 async def get_vector_store_stats():
     """Get vector store statistics"""
     log_request("/documents/stats","GET")
-    stats = vector_store.get_stats()
+    stats = await run_blocking(vector_store.get_stats)
     return VectorStoreStats(**stats)
\ No newline at end of file
@@ -2,9 +2,10 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Dict, List
 from datetime import datetime
+import json
 
 class DocumentUpload(BaseModel):
     """Schema for document upload"""
@@ -20,6 +21,7 @@ class DocumentResponse(BaseModel):
     file_size:int
     page_count: int
     chunk_count:int
+    content_hash: Optional[str] = None
     created_at: datetime
     
     class Config:
@@ -37,4 +39,40 @@ class VectorStoreStats(BaseModel):
     """Schema for vector store statistics"""
     collection_name: str
     total_documents: int
-    persist_directory:str
\ No newline at end of file
+    persist_directory:str
+    embedding_model: Optional[str] = None
+    embedding_dimension: Optional[int] = None
+    embedding_cache: Optional[Dict] = None
+    vector_index: Optional[Dict] = None
+    vector_service: Optional[Dict] = None
+
+
+class BulkDeleteRequest(BaseModel):
+    """Schema for bulk document deletion"""
+    document_ids: List[str] = Field(..., min_length=1)
+    
+    
+class JobResponse(BaseModel):
+    """Schema for background job status"""
+    id: str
+    kind: str
+    status: str
+    document_id: Optional[str]
+    progress: Dict = Field(default_factory=dict)
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime] = None
+    
+    @field_validator("progress", "result", mode="before")
+    @classmethod
+    def parse_json(cls, value, info):
+        """Decode JSON columns stored as text"""
+        if isinstance(value, str):
+            return json.loads(value)
+        if value is None and info.field_name == "progress":
+            return {}
+        return value
+    
+    class Config:
+        from_attributes = True
\ No newline at end of file
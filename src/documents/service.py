@@ -1,19 +1,37 @@
 from pypdf import PdfReader
 from docx import Document as DocxDocument
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import Tuple, Dict, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Tuple, Dict, List, Optional, Callable, Iterable, Iterator, BinaryIO
+from collections import deque
+from datetime import datetime
+import hashlib
+import json
 import os
 import time
+import uuid
 
-from src.documents.models import Document
+from src.documents.models import ACTIVE_STATUSES, Document, Job
 from src.vector_store.client import vector_store
+from src.vector_store.batching import embedding_scheduler
+from src.chat.cache import answer_cache
 from src.core.config import get_settings
+from src.core.executor import run_blocking, get_process_executor
 from src.core.logging import logger, log_performance
+from src.core.metrics import CHUNKS, observe_stage, track_stage
+from src.core.pagination import keyset_page, split_page
 
 
 settings = get_settings()
 
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_SIZE"""
+
 
 class DocumentService:
     """Service for document operations"""
@@ -26,45 +44,93 @@ class DocumentService:
             separators=["\n\n","\n"," ",""]
         )
         
-    def upload_pdf(self, file_path: str, title:str, description: str, db:Session):
-        """Upload and process a PDF document"""
+    def upload_pdf(self, file_path: str, title:str, description: str, db:Session,
+                   document_id: Optional[str] = None, progress: Optional[Callable[..., None]] = None,
+                   content_hash: Optional[str] = None):
+        """Upload and process a PDF document (blocking; run it in the executor)
+        
+        Pages stream from the extractor into the splitter, and chunks are
+        embedded in batches while later pages are still being parsed.
+        `progress` is called with pages_extracted/page_count/total_chunks/
+        chunks_embedded counters as the pipeline advances.
+        """
         start_time = time.time()
+        progress = progress or (lambda **counters: None)
+        document = None
+        session = None
         
         try:
-            text, file_metadata = self.extract_text(file_path)
+            extraction_start = time.perf_counter()
+            pages, file_metadata = self.open_document(file_path)
+            opened = time.perf_counter() - extraction_start
+            progress(pages_extracted=0, page_count=file_metadata['page_count'])
             
+            # The row is only added at commit time: an open write transaction during
+            # extraction and embedding would lock SQLite against the job's progress updates
             document = Document(
+                id=document_id or str(uuid.uuid4()),
                 title=title,
                 description= description,
                 file_name = os.path.basename(file_path),
                 file_path = file_path,
                 file_size = file_metadata['file_size'],
-                page_count = file_metadata['page_count']
+                page_count = file_metadata['page_count'],
+                content_hash = content_hash
             )
             
-            db.add(document)
-            db.flush()
+            counters = {"pages": 0, "text_length": 0}
+            timings = {"extraction": 0.0, "pipeline": 0.0}
             
-            chunks = self.chunk_text(text)
+            def counted(pages):
+                for page in pages:
+                    counters["pages"] += 1
+                    counters["text_length"] += len(page)
+                    yield page
             
-            chunk_ids = self.store_embeddings(
-                document_id = document.id,
-                title = title,
-                chunks = chunks
-            )
+            # Pulling pages measures extraction; pulling chunks measures extraction plus splitting
+            chunks = timed(self.iter_chunks(counted(timed(pages, timings, "extraction"))), timings, "pipeline")
+            
+            # Chunks are embedded in token-sized batches concurrently while pages are still parsed
+            session = embedding_scheduler.session()
+            last_report = time.time()
+            
+            chunk_hashes = []
+            for chunk_index, chunk in enumerate(chunks):
+                chunk_hashes.append(chunk_hash(chunk))
+                session.add(chunk, self.chunk_metadata(document.id, title, chunk_index, None, chunk_hashes[-1]))
+                
+                if time.time() - last_report >= settings.INGESTION_PROGRESS_INTERVAL:
+                    progress(pages_extracted=counters["pages"], chunks_embedded=session.embedded)
+                    last_report = time.time()
+                    
+            chunk_ids = session.flush()
+            extraction_time = opened + timings["extraction"]
+            chunking_time = timings["pipeline"] - timings["extraction"]
+            observe_stage("extraction", extraction_time)
+            observe_stage("chunking", chunking_time)
+            
+            # total_chunks is only known once the last page has been split
+            self.set_total_chunks(document.id, title, chunk_ids, chunk_hashes)
+            progress(pages_extracted=counters["pages"], total_chunks=len(chunk_ids), chunks_embedded=len(chunk_ids))
             
             document.chunk_count = len(chunk_ids)
-            db.commit()
+            db.add(document)
+            with track_stage("db_commit"):
+                db.commit()
             db.refresh(document)
+            answer_cache.invalidate_documents([document.id], include_unscoped=True)
             
             processing_time = time.time() - start_time
             stats = {
                 "document_id" : document.id,
                 "chunks_created" : len(chunk_ids),
-                "text_length" : len(text),
-                "processing_time" : processing_time
+                "text_length" : counters["text_length"],
+                "processing_time" : processing_time,
+                "extraction_time" : extraction_time,
+                "chunking_time" : chunking_time
             }
             
+            CHUNKS.labels("ingested").inc(len(chunk_ids))
             log_performance("upload_pdf", processing_time, document_id = document.id)
             logger.info(f"Document uploaded: {document.id} - {title}")
             
@@ -72,12 +138,56 @@ class DocumentService:
         
         except Exception as e:
             db.rollback()
+            if session is not None:
+                session.abort()
+            if document is not None and document.id:
+                # Drop vectors already written by completed batches
+                try:
+                    vector_store.delete_by_document_id(document.id)
+                except Exception as cleanup_error:
+                    logger.error(f"Error cleaning up vectors for {document.id}: {str(cleanup_error)}")
             logger.error(f"Error uploading PDF: {str(e)}")
             raise
         
         
-    def extract_text(self, file_path: str) -> Tuple[str, Dict]:
-        """Extract text from document"""
+    def save_upload(self, source: BinaryIO, file_path: str, max_size: Optional[int] = None) -> Tuple[int, str]:
+        """Stream an upload to disk in chunks, returning (size, sha256)
+        
+        The size limit (MAX_UPLOAD_SIZE unless given) is enforced while
+        copying; on violation the partial file is removed and
+        UploadTooLargeError is raised.
+        """
+        max_size = max_size or settings.MAX_UPLOAD_SIZE
+        digest = hashlib.sha256()
+        size = 0
+        
+        try:
+            with open(file_path, 'wb') as buffer:
+                while True:
+                    block = source.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not block:
+                        break
+                    
+                    size += len(block)
+                    if size > max_size:
+                        raise UploadTooLargeError(f"File exceeds {max_size} bytes")
+                    
+                    digest.update(block)
+                    buffer.write(block)
+        except Exception:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        
+        return size, digest.hexdigest()
+    
+    async def find_by_hash(self, content_hash: str, db: AsyncSession) -> Optional[Document]:
+        """Find an indexed document with identical file content"""
+        result = await db.execute(select(Document).where(Document.content_hash == content_hash).limit(1))
+        return result.scalars().first()
+    
+    def open_document(self, file_path: str) -> Tuple[Iterator[str], Dict]:
+        """Open a document as a lazy iterator of page texts plus file metadata"""
         file_extension = os.path.splitext(file_path)[1].lower()
         
         if file_extension == '.pdf':
@@ -91,27 +201,51 @@ class DocumentService:
         else:
             raise ValueError(f"Unsupported file type: {file_extension}")
         
-    def _extract_pdf(self, file_path:str) -> Tuple[str, Dict]:
-        """Extract text from PDF"""
-        reader = PdfReader(file_path)
+    def extract_text(self, file_path: str) -> Tuple[str, Dict]:
+        """Extract the full text of a document"""
+        pages, metadata = self.open_document(file_path)
+        return "\n\n".join(page for page in pages if page), metadata
         
-        text_parts = []
-        for i , page in enumerate(reader.pages):
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(f"[Page {i+1}]\n{page_text}")
-                
-        full_text = "\n\n".join(text_parts)
+    def _extract_pdf(self, file_path:str) -> Tuple[Iterator[str], Dict]:
+        """Extract text from PDF, page ranges in parallel worker processes"""
+        page_count = len(PdfReader(file_path).pages)
         
         metadata = {
-            "page_count" : len(reader.pages),
+            "page_count" : page_count,
             "file_size" : os.path.getsize(file_path)
         }
         
-        return full_text, metadata
+        return self._iter_pdf_pages(file_path, page_count), metadata
+    
+    def _iter_pdf_pages(self, file_path: str, page_count: int) -> Iterator[str]:
+        """Yield page texts in order, keeping a bounded number of page ranges in flight"""
+        executor = get_process_executor()
+        step = settings.PDF_PAGES_PER_TASK
+        window = settings.PDF_EXTRACTION_WINDOW or 2 * (settings.EXTRACTION_PROCESSES or os.cpu_count() or 1)
+        
+        ranges = iter(range(0, page_count, step))
+        pending = deque()
+        
+        def submit_next():
+            start = next(ranges, None)
+            if start is not None:
+                pending.append(executor.submit(extract_pdf_pages, file_path, start, min(start + step, page_count)))
+        
+        try:
+            for _ in range(window):
+                submit_next()
+                
+            while pending:
+                pages = pending.popleft().result()
+                submit_next()
+                for i, page_text in pages:
+                    yield f"[Page {i+1}]\n{page_text}" if page_text else ""
+        finally:
+            for future in pending:
+                future.cancel()
     
     
-    def _extract_docx(self,file_path:str ) -> Tuple[str, Dict]:
+    def _extract_docx(self,file_path:str ) -> Tuple[Iterator[str], Dict]:
         """Extract text from DOCX"""
         doc = DocxDocument(file_path)
         
@@ -123,10 +257,10 @@ class DocumentService:
             "file_size" : os.path.getsize(file_path)
         }
         
-        return full_text, metadata
+        return iter([full_text]), metadata
     
     
-    def _extract_txt(self, file_path:str) -> Tuple[str, Dict]:
+    def _extract_txt(self, file_path:str) -> Tuple[Iterator[str], Dict]:
         """Extract text from TXT"""
         with open(file_path, 'r', encoding='utf-8') as f:
             full_text = f.read()
@@ -136,8 +270,22 @@ class DocumentService:
             "file_size" : os.path.getsize(file_path)
         }
         
-        return full_text, metadata
+        return iter([full_text]), metadata
+    
     
+    def prepare_document(self, file_path: str) -> Tuple[List[str], Dict]:
+        """Extract and split a whole document, returning (chunks, file metadata with text_length)"""
+        pages, metadata = self.open_document(file_path)
+        text_length = 0
+        
+        def counted(pages):
+            nonlocal text_length
+            for page in pages:
+                text_length += len(page)
+                yield page
+        
+        chunks = list(self.iter_chunks(counted(pages)))
+        return chunks, {**metadata, "text_length": text_length}
     
     def chunk_text(self, text:str ) -> List[str]:
         """Split text into chunks"""
@@ -145,56 +293,330 @@ class DocumentService:
         logger.info(f"Text split into {len(chunks)} chunks")
         return chunks
     
-    def store_embeddings(self,document_id:str, title:str, chunks: List[str]) -> List[str]:
-        """Store embeddings in vector store"""
-        metadatas = []
-        for i, chunk in enumerate(chunks):
-            metadata = {
-                "document_id": document_id,
-                "title": title,
-                "chunk_index" :i,
-                "total_chunks" : len(chunks)
-            }
+    def iter_chunks(self, pages: Iterable[str]) -> Iterator[str]:
+        """Split a stream of pages incrementally
+        
+        The last chunk of each split may continue on the next page, so it is
+        carried over and re-split together with that page.
+        """
+        carry = ""
+        for page in pages:
+            if not page:
+                continue
+            
+            chunks = self.text_splitter.split_text(f"{carry}\n\n{page}" if carry else page)
+            if not chunks:
+                continue
             
-            metadatas.append(metadata)
+            yield from chunks[:-1]
+            carry = chunks[-1]
             
-        chunk_ids = vector_store.add_documents(texts = chunks, metadatas=metadatas)
+        if carry:
+            yield carry
+    
+    def store_embeddings(self,document_id:str, title:str, chunks: List[str],
+                         start_index: int = 0, total_chunks: Optional[int] = None) -> List[str]:
+        """Store embeddings in vector store"""
+        metadatas = [
+            self.chunk_metadata(document_id, title, start_index + i, total_chunks, chunk_hash(chunk))
+            for i, chunk in enumerate(chunks)
+        ]
+            
+        chunk_ids = embedding_scheduler.embed_and_store(texts = chunks, metadatas=metadatas)
         
         logger.info(f"Stored {len(chunk_ids)} embeddings for document {document_id}")
         return chunk_ids
     
+    def chunk_metadata(self, document_id: str, title: str, chunk_index: int, total_chunks: Optional[int],
+                       content_hash: Optional[str] = None) -> Dict:
+        """Build the vector store metadata for a chunk"""
+        metadata = {
+            "document_id": document_id,
+            "title": title,
+            "chunk_index" :chunk_index,
+        }
+        if total_chunks is not None:
+            metadata["total_chunks"] = total_chunks
+        if content_hash is not None:
+            metadata["chunk_hash"] = content_hash
+        return metadata
+    
+    def set_total_chunks(self, document_id: str, title: str, chunk_ids: List[str],
+                         chunk_hashes: Optional[List[str]] = None):
+        """Record total_chunks on every chunk once a streamed document is complete"""
+        metadatas = [
+            self.chunk_metadata(document_id, title, i, len(chunk_ids), chunk_hashes[i] if chunk_hashes else None)
+            for i in range(len(chunk_ids))
+        ]
+        vector_store.update_metadatas(ids=chunk_ids, metadatas=metadatas)
     
-    def delete_document(self, document_id:str , db:Session):
+    
+    async def delete_document(self, document_id:str , db:AsyncSession):
         """Delete document and its embedding"""
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await db.get(Document, document_id)
         
         if not document:
             raise ValueError(f"Document {document_id} not found")
         
-        vector_store.delete_by_document_id(document_id)
+        await run_blocking(vector_store.delete_by_document_id, document_id)
         
         if os.path.exists(document.file_path):
-            os.remove(document.file_path)
+            await run_blocking(os.remove, document.file_path)
             
-        db.delete(document)
-        db.commit()
+        await db.delete(document)
+        await db.commit()
+        answer_cache.invalidate_documents([document_id])
         
         logger.info(f"Deleted document: {document_id}")
         
+    def update_document(self, document_id: str, file_path: str, db: Session, title: Optional[str] = None,
+                        description: Optional[str] = None, content_hash: Optional[str] = None,
+                        progress: Optional[Callable[..., None]] = None) -> Dict:
+        """Re-index a document from a new file, embedding only chunks whose content changed
+        
+        New chunks are matched to the stored ones by content hash. Matches keep
+        their vectors and only get new chunk_index/total_chunks metadata; new
+        content is embedded and chunks that disappeared are deleted.
+        """
+        start_time = time.time()
+        progress = progress or (lambda **counters: None)
+        document = db.get(Document, document_id)
+        if document is None:
+            raise ValueError(f"Document {document_id} not found")
+        
+        title = title or document.title
+        chunks, file_metadata = self.prepare_document(file_path)
+        progress(total_chunks=len(chunks))
         
-    def get_document(self, document_id: str, db:Session) -> Document:
+        # Stored chunks by content; chunks indexed before hashes were recorded are hashed from their text
+        stored: Dict[str, List[str]] = {}
+        for chunk_id, text, metadata in vector_store.get_document_chunks(document_id):
+            stored.setdefault(metadata.get("chunk_hash") or chunk_hash(text), []).append(chunk_id)
+        
+        reused_ids, reused_metadatas = [], []
+        session = embedding_scheduler.session()
+        added_ids = []
+        
+        try:
+            for chunk_index, chunk in enumerate(chunks):
+                digest = chunk_hash(chunk)
+                metadata = self.chunk_metadata(document_id, title, chunk_index, len(chunks), digest)
+                
+                if stored.get(digest):
+                    reused_ids.append(stored[digest].pop())
+                    reused_metadatas.append(metadata)
+                else:
+                    added_ids.append(session.add(chunk, metadata))
+                    
+            session.flush()
+            progress(chunks_embedded=len(added_ids), chunks_reused=len(reused_ids))
+            
+            vector_store.update_metadatas(ids=reused_ids, metadatas=reused_metadatas)
+            
+            removed_ids = [chunk_id for chunk_ids in stored.values() for chunk_id in chunk_ids]
+            vector_store.delete_by_ids(removed_ids)
+            
+        except Exception:
+            # Stored chunks are only changed once every new chunk is embedded; a retried update re-matches them
+            session.abort()
+            vector_store.delete_by_ids(added_ids)
+            raise
+        
+        old_file_path = document.file_path
+        document.title = title
+        if description is not None:
+            document.description = description
+        document.file_name = os.path.basename(file_path)
+        document.file_path = file_path
+        document.file_size = file_metadata["file_size"]
+        document.page_count = file_metadata["page_count"]
+        document.chunk_count = len(chunks)
+        document.content_hash = content_hash
+        with track_stage("db_commit"):
+            db.commit()
+        answer_cache.invalidate_documents([document_id], include_unscoped=True)
+        
+        if old_file_path != file_path:
+            self._remove_file(old_file_path)
+        
+        CHUNKS.labels("reused").inc(len(reused_ids))
+        processing_time = time.time() - start_time
+        log_performance("update_document", processing_time, document_id=document_id)
+        
+        return {
+            "document_id": document_id,
+            "chunks_total": len(chunks),
+            "chunks_reused": len(reused_ids),
+            "chunks_embedded": len(added_ids),
+            "chunks_deleted": len(removed_ids),
+            "processing_time": processing_time
+        }
+    
+    def delete_documents(self, document_ids: List[str], db: Session,
+                         progress: Optional[Callable[..., None]] = None) -> Dict:
+        """Delete many documents (blocking; runs as a background job)
+        
+        Rows are removed first so the documents disappear at once; vectors are
+        then deleted in batched filtered deletes and files last. Anything left
+        behind by a crash in between is collected by collect_garbage.
+        """
+        progress = progress or (lambda **counters: None)
+        batch_size = settings.DELETE_BATCH_SIZE
+        found = {}
+        
+        for start in range(0, len(document_ids), batch_size):
+            batch = document_ids[start:start + batch_size]
+            rows = db.query(Document.id, Document.file_path).filter(Document.id.in_(batch)).all()
+            found.update(rows)
+            db.query(Document).filter(Document.id.in_(batch)).delete(synchronize_session=False)
+        db.commit()
+        
+        answer_cache.invalidate_documents(list(found))
+        progress(documents_deleted=len(found))
+        
+        # Requested ids without a row may still have vectors from an interrupted earlier run
+        vector_store.delete_by_document_ids(
+            document_ids, batch_size=batch_size,
+            progress=lambda done: progress(vectors_deleted_for=done)
+        )
+        
+        files_removed = 0
+        for file_path in found.values():
+            if self._remove_file(file_path):
+                files_removed += 1
+        progress(files_removed=files_removed)
+        
+        logger.info(f"Bulk deleted {len(found)} documents")
+        return {
+            "deleted": len(found),
+            "not_found": [document_id for document_id in document_ids if document_id not in found],
+            "files_removed": files_removed
+        }
+    
+    def collect_garbage(self, db: Session) -> Dict:
+        """Reconcile Chroma, the keyword index and UPLOAD_DIR with the documents table
+        
+        Vectors and keyword entries of documents that have no row, and upload
+        files no document or active job refers to, are removed. Storage is
+        scanned before the table is read, so anything written by an upload
+        that starts during the sweep is always known by the time it is checked.
+        """
+        vector_documents = vector_store.list_document_ids()
+        keyword_documents = vector_store.keyword_index.document_ids()
+        
+        cutoff = time.time() - settings.GC_MIN_FILE_AGE
+        upload_files = set()
+        with os.scandir(settings.UPLOAD_DIR) as entries:
+            for entry in entries:
+                # Young files may belong to an upload whose job is not created yet
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    upload_files.add(os.path.abspath(entry.path))
+        
+        known_documents = set()
+        known_files = set()
+        for document_id, file_path in db.query(Document.id, Document.file_path):
+            known_documents.add(document_id)
+            known_files.add(os.path.abspath(file_path))
+        active_jobs = db.query(Job.document_id, Job.file_path, Job.payload, Job.progress).filter(
+            Job.status.in_(ACTIVE_STATUSES)
+        )
+        for document_id, file_path, payload, progress in active_jobs:
+            if document_id:
+                known_documents.add(document_id)
+            if file_path:
+                known_files.add(os.path.abspath(file_path))
+            # Bulk jobs list their files and archives in the payload, and the ids of
+            # documents whose vectors are written before their rows in the progress
+            for item in json.loads(payload or "{}").get("items", []):
+                known_files.add(os.path.abspath(item["file_path"]))
+            known_documents.update(json.loads(progress or "{}").get("reserved_document_ids", []))
+        
+        orphaned_vectors = sorted(vector_documents - known_documents)
+        if orphaned_vectors:
+            vector_store.delete_by_document_ids(orphaned_vectors, batch_size=settings.DELETE_BATCH_SIZE)
+        
+        orphaned_keywords = keyword_documents - known_documents - set(orphaned_vectors)
+        if orphaned_keywords:
+            vector_store.keyword_index.delete_documents(orphaned_keywords)
+        
+        orphaned_files = upload_files - known_files
+        files_removed = sum(1 for file_path in orphaned_files if self._remove_file(file_path))
+        
+        # Tombstones below the automatic compaction threshold are reclaimed here
+        compacted = vector_store.compact_vector_index()
+        
+        result = {
+            "orphaned_vector_documents": len(orphaned_vectors),
+            "orphaned_keyword_documents": len(orphaned_keywords),
+            "orphaned_files": files_removed,
+            "vector_index_compacted": compacted
+        }
+        logger.info(f"Garbage collection: {result}")
+        return result
+    
+    def _remove_file(self, file_path: str) -> bool:
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.error(f"Error removing {file_path}: {str(e)}")
+            return False
+        
+    async def get_document(self, document_id: str, db:AsyncSession) -> Document:
         """Get document by ID"""
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await db.get(Document, document_id)
         
         if not document:
             raise ValueError(f"Document {document_id} not found")
         
         return document
     
-    def list_documents(self, db:Session , skip:int = 0, limit: int = 100) -> List[Document]:
-        """List all documents"""
-        return db.query(Document).offset(skip).limit(limit).all()
+    async def list_documents(self, db:AsyncSession , limit: int = 100, cursor: Optional[str] = None,
+                             title_prefix: Optional[str] = None, created_after: Optional[datetime] = None,
+                             created_before: Optional[datetime] = None) -> Tuple[List[Document], Optional[str]]:
+        """List documents newest first, one keyset page at a time
+        
+        Returns the page and the cursor of the next one (None on the last page).
+        Raises InvalidCursorError for a cursor this API did not issue.
+        """
+        stmt = select(Document)
+        if title_prefix:
+            stmt = stmt.where(Document.title.startswith(title_prefix, autoescape=True))
+        if created_after is not None:
+            stmt = stmt.where(Document.created_at >= created_after)
+        if created_before is not None:
+            stmt = stmt.where(Document.created_at < created_before)
+        
+        result = await db.execute(keyset_page(stmt, Document.created_at, Document.id, cursor, limit))
+        return split_page(list(result.scalars().all()), limit)
     
     
 document_service = DocumentService()
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash identifying a chunk across re-indexing"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def timed(iterable: Iterable, timings: Dict[str, float], key: str) -> Iterator:
+    """Yield from an iterable, adding the time spent producing items to timings[key]"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings[key] += time.perf_counter() - start
+        yield item
+
+
+def extract_pdf_pages(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract a range of PDF pages (runs in the process pool)"""
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
         
\ No newline at end of file
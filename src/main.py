@@ -1,18 +1,23 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
+import asyncio
+import time
 
 from src.core.config import get_settings
 from src.core.logging import logger
-from src.database import init_db
+from src.database import init_db, async_engine
+from src.core.executor import shutdown_executors
+from src.core.metrics import CHAT_HISTORY_BACKLOG, HTTP_IN_FLIGHT, HTTP_LATENCY, INGESTION_BACKLOG, render_metrics
+from src.core.tracing import start_trace, exporter as trace_exporter
 from src.documents.router import router as documents_router
+from src.documents.jobs import ingestion_queue, run_periodic_gc
+from src.vector_store.client import vector_store
 from src.chat.router import router as chat_router
-
-from slowapi import _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
+from src.chat.history import history_writer
 from src.core.rate_limit import limiter
 
 settings = get_settings()
@@ -20,8 +25,8 @@ settings = get_settings()
 # API Key Middleware
 class APIKeyMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request, call_next):
-        # Skip health check endpoint
-        if request.url.path in ["/","/health"]:
+        # Skip health check and metrics endpoints
+        if request.url.path in ["/","/health","/metrics"]:
             return await call_next(request)
         
         # Check API Key
@@ -36,6 +41,47 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
         return response
 
 
+# Request Metrics Middleware
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start_time = time.perf_counter()
+        status_code = 500
+        HTTP_IN_FLIGHT.inc()
+        
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Label by route template so path parameters do not create new series
+            route = request.scope.get("route")
+            HTTP_LATENCY.labels(
+                request.method, route.path if route else "unmatched", str(status_code)
+            ).observe(time.perf_counter() - start_time)
+
+
+# Request Tracing Middleware
+class TracingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        with start_trace(
+            f"{request.method} {request.url.path}",
+            traceparent=request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.target": request.url.path}
+        ) as trace:
+            response = await call_next(request)
+            
+            route = request.scope.get("route")
+            if route:
+                trace.root.name = f"{request.method} {route.path}"
+            trace.root.attributes["http.status_code"] = response.status_code
+            
+            if settings.SERVER_TIMING_ENABLED:
+                # Streamed bodies run after the headers are sent, so only stages finished by now are listed
+                response.headers["Server-Timing"] = trace.server_timing()
+            return response
+
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -44,13 +90,28 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Document Q&A API...")
     init_db()
     logger.info("Database initialized")
+    limiter.start()
+    ingestion_queue.start()
+    INGESTION_BACKLOG.set_function(lambda: ingestion_queue.backlog)
+    history_writer.start()
+    CHAT_HISTORY_BACKLOG.set_function(lambda: history_writer.backlog)
+    gc_task = asyncio.create_task(run_periodic_gc(settings.GC_INTERVAL)) if settings.GC_INTERVAL > 0 else None
     logger.info(f"API running at: http://0.0.0.0:8000")
     logger.info(f"Docs at: http://0.0.0.0:8000/docs")
     
     yield
     
-    # Shutdown (if needed)
+    # Shutdown
     logger.info("Shutting down...")
+    if gc_task is not None:
+        gc_task.cancel()
+    ingestion_queue.stop()
+    # Drain queued chat history before the engine is disposed
+    await history_writer.stop()
+    vector_store.keyword_index.save()
+    trace_exporter.shutdown()
+    await async_engine.dispose()
+    shutdown_executors()
 
 
 app = FastAPI(
@@ -59,23 +120,31 @@ app = FastAPI(
     description="RAG-powered Document Q&A API",
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Checks the token bucket of every route declared with @limiter.limit
+    dependencies=[Depends(limiter)]
 )
 
-# Add Rate Limiter
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # Add API Key Middleware
 app.add_middleware(APIKeyMiddleware)
 
+# Add Tracing Middleware
+if settings.SERVER_TIMING_ENABLED or trace_exporter.enabled:
+    app.add_middleware(TracingMiddleware)
+
+# Add Metrics Middleware (outside the API key check so rejected requests are counted)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Add CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    # Let browser dashboards read the paging headers
+    expose_headers=["ETag", "X-Next-Cursor"]
 )
 
 
@@ -96,6 +165,16 @@ async def health_check():
     return HealthCheck()
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 app.include_router(
     documents_router,
     prefix=f"{settings.API_V1_STR}/documents",
@@ -0,0 +1,179 @@
+import contextvars
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from src.vector_store.client import VectorStoreClient, vector_store
+from src.core.config import get_settings
+from src.core.logging import logger
+from src.core.metrics import CHUNKS, TOKENS, track_stage
+from src.core.tokens import count_tokens, load_encoding
+
+settings = get_settings()
+
+
+class EmbeddingScheduler:
+    """Packs chunks into token-bounded batches and embeds them concurrently"""
+
+    def __init__(self, store: VectorStoreClient, model: Optional[str], max_batch_tokens: int, max_batch_items: int,
+                 concurrency: int, max_retries: int, retry_backoff: float):
+        self.store = store
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        # Without a model (local embedders) token counts are estimated
+        self.encoding = load_encoding(model)
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embedding")
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens the embedding model will see for a text"""
+        return count_tokens(self.encoding, text)
+
+    def session(self) -> "EmbeddingSession":
+        """Start a session that embeds and stores chunks as they are added"""
+        return EmbeddingSession(self)
+
+    def embed_and_store(self, texts: List[str], metadatas: List[Dict]) -> List[str]:
+        """Embed and store a complete list of chunks"""
+        session = self.session()
+        try:
+            for text, metadata in zip(texts, metadatas):
+                session.add(text, metadata)
+            return session.flush()
+        except Exception:
+            session.abort()
+            raise
+
+    def _run_batch(self, texts: List[str], metadatas: List[Dict], ids: List[str], tokens: int = 0) -> List[str]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with track_stage("embed_documents"):
+                    embeddings = self.store.embed_documents(texts)
+                # Upsert with fixed ids so a retried batch never duplicates chunks
+                with track_stage("vector_upsert"):
+                    chunk_ids = self.store.add_embeddings(texts=texts, embeddings=embeddings, metadatas=metadatas, ids=ids)
+
+                TOKENS.labels("embedding").inc(tokens)
+                CHUNKS.labels("embedded").inc(len(chunk_ids))
+                return chunk_ids
+
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Embedding batch of {len(texts)} chunks failed after {attempt + 1} attempts: {str(e)}")
+                    raise
+
+                delay = self.retry_backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+                logger.info(f"Embedding batch failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
+class EmbeddingSession:
+    """One ingestion's stream of chunks, dispatched to the scheduler in token-sized batches
+
+    Completed batches are written to the vector store as they finish. At most
+    twice the concurrency limit of batches are pending, so producers block
+    instead of buffering a whole document.
+    """
+
+    def __init__(self, scheduler: EmbeddingScheduler):
+        self.scheduler = scheduler
+        self.embedded = 0
+        self.error = None
+
+        self._texts: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._ids: List[str] = []
+        self._tokens = 0
+        self._futures: List[Future] = []
+        self._slots = threading.BoundedSemaphore(scheduler.concurrency * 2)
+        self._lock = threading.Lock()
+
+    def add(self, text: str, metadata: Dict) -> str:
+        """Queue a chunk, dispatching the current batch when it is full; returns the chunk id"""
+        if self.error is not None:
+            # A batch already failed after retries, stop producing
+            raise self.error
+
+        tokens = self.scheduler.count_tokens(text)
+
+        if self._texts and (
+            self._tokens + tokens > self.scheduler.max_batch_tokens
+            or len(self._texts) >= self.scheduler.max_batch_items
+        ):
+            self._dispatch()
+
+        chunk_id = str(uuid.uuid4())
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        self._ids.append(chunk_id)
+        self._tokens += tokens
+        return chunk_id
+
+    def flush(self) -> List[str]:
+        """Dispatch the remaining chunks and wait; returns ids in the order chunks were added"""
+        if self._texts:
+            self._dispatch()
+
+        chunk_ids = []
+        errors = []
+        for future in self._futures:
+            try:
+                chunk_ids.extend(future.result())
+            except Exception as e:
+                errors.append(e)
+
+        if errors:
+            raise errors[0]
+        return chunk_ids
+
+    def abort(self):
+        """Cancel batches that have not started and wait for the running ones"""
+        for future in self._futures:
+            future.cancel()
+        for future in self._futures:
+            if not future.cancelled():
+                try:
+                    future.result()
+                except Exception:
+                    pass
+
+    def _dispatch(self):
+        texts, metadatas, ids, tokens = self._texts, self._metadatas, self._ids, self._tokens
+        self._texts, self._metadatas, self._ids, self._tokens = [], [], [], 0
+
+        self._slots.acquire()
+        # Run in a copy of the caller's context so the batch's spans join its trace
+        context = contextvars.copy_context()
+        future = self.scheduler._executor.submit(context.run, self.scheduler._run_batch, texts, metadatas, ids, tokens)
+        future.add_done_callback(self._batch_done)
+        self._futures.append(future)
+
+    def _batch_done(self, future: Future):
+        self._slots.release()
+        if future.cancelled():
+            return
+
+        with self._lock:
+            if future.exception() is not None:
+                self.error = self.error or future.exception()
+            else:
+                self.embedded += len(future.result())
+
+
+embedding_scheduler = EmbeddingScheduler(
+    store=vector_store,
+    # tiktoken only describes OpenAI models; local embedders batch on estimated counts
+    model=vector_store.embedding_model if settings.EMBEDDING_BACKEND == "openai" else None,
+    max_batch_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+    max_batch_items=settings.EMBEDDING_BATCH_MAX_ITEMS,
+    concurrency=settings.EMBEDDING_CONCURRENCY,
+    max_retries=settings.EMBEDDING_MAX_RETRIES,
+    retry_backoff=settings.EMBEDDING_RETRY_BACKOFF
+)
@@ -0,0 +1,174 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.core.logging import logger
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms; identifiers like A-123 or 4.2.1 stay whole"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """In-process BM25 inverted index over chunk text, persisted to a JSON file"""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75, save_interval: float = 5.0):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.save_interval = save_interval
+
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._chunks: Dict[str, Tuple[str, int, Dict[str, int]]] = {}
+        self._by_document: Dict[str, Set[str]] = defaultdict(set)
+        self._total_length = 0
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def add(self, ids: List[str], texts: List[str], document_ids: List[str]):
+        """Index chunks (re-adding an id replaces it)"""
+        with self._lock:
+            for chunk_id, text, document_id in zip(ids, texts, document_ids):
+                if chunk_id in self._chunks:
+                    self._remove_chunk(chunk_id)
+                self._add_chunk(chunk_id, document_id, Counter(tokenize(text)))
+            self._mark_dirty()
+
+    def delete_chunks(self, ids: Iterable[str]):
+        """Remove chunks by id"""
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._chunks:
+                    self._remove_chunk(chunk_id)
+            self._mark_dirty()
+
+    def delete_documents(self, document_ids: Iterable[str]):
+        """Remove every chunk of the given documents"""
+        with self._lock:
+            for document_id in document_ids:
+                for chunk_id in list(self._by_document.get(document_id, ())):
+                    self._remove_chunk(chunk_id)
+            self._mark_dirty()
+
+    def document_ids(self) -> Set[str]:
+        """Ids of all documents with indexed chunks"""
+        with self._lock:
+            return set(self._by_document)
+
+    def search(self, query: str, k: int, document_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Return (chunk_id, score) for the top-k chunks"""
+        terms = set(tokenize(query))
+        allowed = None
+
+        with self._lock:
+            if not terms or not self._chunks:
+                return []
+
+            if document_ids:
+                allowed = set()
+                for document_id in document_ids:
+                    allowed.update(self._by_document.get(document_id, ()))
+
+            count = len(self._chunks)
+            average_length = self._total_length / count
+            scores: Dict[str, float] = defaultdict(float)
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    if allowed is not None and chunk_id not in allowed:
+                        continue
+                    length = self._chunks[chunk_id][1]
+                    norm = frequency + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[chunk_id] += idf * frequency * (self.k1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self):
+        """Write the index to disk atomically"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+
+            data = {
+                chunk_id: [document_id, terms]
+                for chunk_id, (document_id, _, terms) in self._chunks.items()
+            }
+            self._dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load keyword index, starting empty: {str(e)}")
+            return
+
+        for chunk_id, (document_id, terms) in data.items():
+            self._add_chunk(chunk_id, document_id, terms)
+        logger.info(f"Keyword index loaded: {len(self._chunks)} chunks")
+
+    def _add_chunk(self, chunk_id: str, document_id: str, terms: Dict[str, int]):
+        length = sum(terms.values())
+        self._chunks[chunk_id] = (document_id, length, dict(terms))
+        self._by_document[document_id].add(chunk_id)
+        self._total_length += length
+        for term, frequency in terms.items():
+            self._postings[term][chunk_id] = frequency
+
+    def _remove_chunk(self, chunk_id: str):
+        document_id, length, terms = self._chunks.pop(chunk_id)
+        self._total_length -= length
+
+        chunk_ids = self._by_document.get(document_id)
+        if chunk_ids is not None:
+            chunk_ids.discard(chunk_id)
+            if not chunk_ids:
+                del self._by_document[document_id]
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _mark_dirty(self):
+        # Saves are debounced so streaming ingestion does not rewrite the file per batch
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_interval, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
@@ -1,24 +1,62 @@
 import chromadb
 from chromadb.config import Settings as ChromaSettings
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
-from typing import Optional, List, Dict
+from langchain_core.documents import Document
+from typing import Optional, List, Dict, Tuple, Set, Callable
 from src.core.config import get_settings
 from src.core.logging import logger
+from src.core.metrics import cache_collector
+from src.vector_store.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.vector_store.bm25 import BM25Index
+from src.vector_store.flat_index import FlatIndex
+from src.vector_store.embeddings import create_embeddings
 import os
 
 settings = get_settings()
 
-class VectorStoreClient:
+class EmbeddingClient:
+    """Embedding backend (behind the embedding cache) shared by local and remote vector stores"""
+    
+    def __init__(self):
+        self.embeddings, self.embedding_model, self.embedding_dimension = create_embeddings(settings)
+        
+        self.embedding_cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.embedding_cache = EmbeddingCache(
+                path=settings.EMBEDDING_CACHE_PATH,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+            self.embeddings = CachedEmbeddings(
+                underlying=self.embeddings,
+                cache=self.embedding_cache,
+                model=self.embedding_model
+            )
+            cache_collector.register("embedding", self.embedding_cache)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed chunk texts (served from the embedding cache when possible)"""
+        return self.embeddings.embed_documents(texts)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query text"""
+        return self.embeddings.embed_query(query)
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """Embed a query text without blocking the event loop"""
+        return await self.embeddings.aembed_query(query)
+    
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many query texts in one call; like single queries, they bypass the embedding cache"""
+        embeddings = self.embeddings.underlying if isinstance(self.embeddings, CachedEmbeddings) else self.embeddings
+        return await embeddings.aembed_documents(queries)
+
+
+class VectorStoreClient(EmbeddingClient):
     """Client for ChromaDB vector store operations"""
     
     def __init__(self):
         os.makedirs(settings.CHROMA_PERSIST_DIR, exist_ok=True)
-        
-        self.embeddings = OpenAIEmbeddings(
-            model=settings.OPENAI_EMBEDDING_MODEL,
-            openai_api_key = settings.OPENAI_API_KEY
-        )
+        super().__init__()
         
         self.client = chromadb.PersistentClient(
             path=settings.CHROMA_PERSIST_DIR,
@@ -27,8 +65,9 @@ class VectorStoreClient:
         
         self.collection = self.client.get_or_create_collection(
             name=settings.CHROMA_COLLECTION_NAME,
-            metadata={"description": "Document embeddings for RAG"}
+            metadata=self._collection_metadata()
         )
+        self.compatibility_error = self._check_collection()
         
         self.vectorstore = Chroma(
             client=self.client,
@@ -36,12 +75,95 @@ class VectorStoreClient:
             embedding_function = self.embeddings
         )
         
+        self.keyword_index = BM25Index(
+            path=settings.KEYWORD_INDEX_PATH,
+            save_interval=settings.KEYWORD_INDEX_SAVE_INTERVAL
+        )
+        if len(self.keyword_index) == 0 and self.collection.count() > 0:
+            self.rebuild_keyword_index()
+        
+        self.vector_index = self._create_vector_index()
+        # Chroma is the source of truth; a missing or stale index (e.g. after a crash) is rebuilt from it
+        if (self.vector_index is not None and self.compatibility_error is None
+                and len(self.vector_index) != self.collection.count()):
+            self.rebuild_vector_index()
+        
         logger.info(f"Vector store initialized: {settings.CHROMA_COLLECTION_NAME}")
         
+    def _collection_metadata(self) -> Dict:
+        metadata = {
+            "description": "Document embeddings for RAG",
+            "embedding_model": self.embedding_model
+        }
+        if self.embedding_dimension:
+            metadata["embedding_dimension"] = self.embedding_dimension
+        return metadata
+    
+    def _create_vector_index(self) -> Optional[FlatIndex]:
+        """Open the configured nearest-neighbour index; None searches Chroma's own index"""
+        backend = settings.VECTOR_INDEX_BACKEND.lower()
+        if backend == "chroma":
+            return None
+        if backend != "flat":
+            raise ValueError(f"Unsupported vector index backend: {backend}")
+        
+        return FlatIndex(
+            directory=settings.FLAT_INDEX_DIR,
+            dimension=self.embedding_dimension,
+            compact_ratio=settings.FLAT_INDEX_COMPACT_RATIO,
+            save_interval=settings.FLAT_INDEX_SAVE_INTERVAL,
+            quantization=settings.FLAT_INDEX_QUANTIZATION.lower(),
+            rescore_multiplier=settings.FLAT_INDEX_RESCORE_MULTIPLIER
+        )
+    
+    def _check_collection(self) -> Optional[str]:
+        """Tag the collection with the embedding backend, or report a mismatch"""
+        metadata = self.collection.metadata or {}
+        tagged_model = metadata.get("embedding_model")
+        
+        if tagged_model is None:
+            # Collections created before tagging were built with OpenAI embeddings
+            if self.collection.count() == 0 or self.embedding_model == settings.OPENAI_EMBEDDING_MODEL:
+                self.collection.modify(metadata=self._collection_metadata())
+                return None
+            tagged_model = settings.OPENAI_EMBEDDING_MODEL
+            
+        tagged_dimension = metadata.get("embedding_dimension")
+        if tagged_model != self.embedding_model or (
+            tagged_dimension and self.embedding_dimension and tagged_dimension != self.embedding_dimension
+        ):
+            message = (
+                f"Collection {settings.CHROMA_COLLECTION_NAME} was built with {tagged_model} "
+                f"(dimension {tagged_dimension}), but the configured backend is {self.embedding_model} "
+                f"(dimension {self.embedding_dimension})"
+            )
+            logger.error(message)
+            return message
+        
+        return None
+    
+    def _ensure_compatible(self, embedding: Optional[List[float]] = None):
+        """Reject operations that would mix vector spaces"""
+        if self.compatibility_error:
+            raise ValueError(self.compatibility_error)
+        if embedding is not None and self.embedding_dimension and len(embedding) != self.embedding_dimension:
+            raise ValueError(
+                f"Query vector has dimension {len(embedding)}, collection expects {self.embedding_dimension}"
+            )
+        
     def add_documents(self, texts: List[str], metadatas:List[Dict], ids:Optional[List[str]]= None) -> List[str]:
         """Add documents to vector store"""
+        self._ensure_compatible()
         try:
             doc_ids = self.vectorstore.add_texts(texts=texts, metadatas=metadatas,ids = ids)
+            self.keyword_index.add(doc_ids, texts, [metadata.get("document_id", "") for metadata in metadatas])
+            if self.vector_index is not None:
+                # LangChain embeds internally, so read the vectors back
+                stored = self.collection.get(ids=doc_ids, include=["embeddings", "metadatas"])
+                self.vector_index.add(
+                    stored["ids"], stored["embeddings"],
+                    [(metadata or {}).get("document_id", "") for metadata in stored["metadatas"]]
+                )
             logger.info(f"Added {len(doc_ids)} documents to vector store")
             return doc_ids
         except Exception as e:
@@ -58,25 +180,289 @@ class VectorStoreClient:
         except Exception as e:
             logger.error(f"Error searching: {str(e)}")
     
+    def add_embeddings(self, texts: List[str], embeddings: List[List[float]], metadatas: List[Dict], ids: List[str]) -> List[str]:
+        """Write precomputed embeddings; existing ids are overwritten"""
+        self._ensure_compatible(embeddings[0] if embeddings else None)
+        try:
+            self.collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+            document_ids = [metadata.get("document_id", "") for metadata in metadatas]
+            self.keyword_index.add(ids, texts, document_ids)
+            if self.vector_index is not None:
+                self.vector_index.add(ids, embeddings, document_ids)
+            logger.info(f"Added {len(ids)} documents to vector store")
+            return ids
+        except Exception as e:
+            logger.error(f"Error adding embeddings: {str(e)}")
+            raise
+        
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict], batch_size: int = 500):
+        """Replace chunk metadata in place without re-embedding"""
+        try:
+            for start in range(0, len(ids), batch_size):
+                self.collection.update(
+                    ids=ids[start:start + batch_size],
+                    metadatas=metadatas[start:start + batch_size]
+                )
+        except Exception as e:
+            logger.error(f"Error updating metadata: {str(e)}")
+            raise
+        
+    def search_by_vector(self, embedding: List[float], k: int = 3, filter_dict: Optional[Dict] = None,
+                         document_ids: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """Search with a precomputed query vector, skipping the embedding call
+        
+        Document filters are served by the flat index when it is enabled;
+        any other metadata filter goes to Chroma.
+        """
+        self._ensure_compatible(embedding)
+        if self.vector_index is not None and filter_dict is None:
+            ranked = self.vector_index.search(embedding, k, document_ids or None)
+            documents = self.get_by_ids([chunk_id for chunk_id, _ in ranked]) if ranked else {}
+            hits = [(documents[chunk_id], distance) for chunk_id, distance in ranked if chunk_id in documents]
+            logger.info(f"Vector search return {len(hits)} results")
+            return hits
+        
+        if filter_dict is None:
+            filter_dict = document_filter(document_ids)
+        try:
+            results = self.collection.query(
+                query_embeddings=[embedding],
+                n_results=k,
+                where=filter_dict,
+                include=["documents", "metadatas", "distances"]
+            )
+            
+            hits = [
+                (Document(page_content=text, metadata={**(metadata or {}), "_id": chunk_id}), distance)
+                for chunk_id, text, metadata, distance in zip(
+                    results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+                )
+            ]
+            logger.info(f"Vector search return {len(hits)} results")
+            return hits
+        
+        except Exception as e:
+            logger.error(f"Error searching by vector: {str(e)}")
+            raise
+    
+    def search_by_vectors(self, embeddings: List[List[float]], k: int = 3,
+                          document_ids: Optional[List[str]] = None) -> List[List[Tuple[Document, float]]]:
+        """Search with many query vectors at once: one Chroma query (or flat index pass per vector)
+        and one fetch for all hits"""
+        for embedding in embeddings:
+            self._ensure_compatible(embedding)
+        if not embeddings:
+            return []
+        
+        if self.vector_index is not None:
+            ranked = [self.vector_index.search(embedding, k, document_ids or None) for embedding in embeddings]
+            chunk_ids = list({chunk_id for hits in ranked for chunk_id, _ in hits})
+            documents = self.get_by_ids(chunk_ids) if chunk_ids else {}
+            return [
+                [(documents[chunk_id], distance) for chunk_id, distance in hits if chunk_id in documents]
+                for hits in ranked
+            ]
+        
+        try:
+            results = self.collection.query(
+                query_embeddings=embeddings,
+                n_results=k,
+                where=document_filter(document_ids),
+                include=["documents", "metadatas", "distances"]
+            )
+            return [
+                [
+                    (Document(page_content=text, metadata={**(metadata or {}), "_id": chunk_id}), distance)
+                    for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances)
+                ]
+                for ids, texts, metadatas, distances in zip(
+                    results["ids"], results["documents"], results["metadatas"], results["distances"]
+                )
+            ]
+        
+        except Exception as e:
+            logger.error(f"Error searching by vectors: {str(e)}")
+            raise
+    
+    def keyword_search(self, query: str, k: int = 3, document_ids: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """BM25 search over chunk text; scores are BM25 (higher is better)"""
+        ranked = self.keyword_index.search(query, k, document_ids)
+        if not ranked:
+            return []
+        
+        documents = self.get_by_ids([chunk_id for chunk_id, _ in ranked])
+        return [(documents[chunk_id], score) for chunk_id, score in ranked if chunk_id in documents]
+    
+    def hybrid_search(self, query: str, embedding: List[float], k: int = 3,
+                      document_ids: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """Fuse dense and BM25 rankings with reciprocal rank fusion; scores are RRF (higher is better)"""
+        candidates = k * settings.HYBRID_CANDIDATE_MULTIPLIER
+        dense = self.search_by_vector(embedding, k=candidates, document_ids=document_ids)
+        sparse = self.keyword_index.search(query, candidates, document_ids)
+        
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        
+        for rank, (doc, _) in enumerate(dense):
+            chunk_id = doc.metadata["_id"]
+            documents[chunk_id] = doc
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (settings.RRF_K + rank + 1)
+            
+        for rank, (chunk_id, _) in enumerate(sparse):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (settings.RRF_K + rank + 1)
+        
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        
+        missing = [chunk_id for chunk_id, _ in top if chunk_id not in documents]
+        if missing:
+            documents.update(self.get_by_ids(missing))
+            
+        return [(documents[chunk_id], score) for chunk_id, score in top if chunk_id in documents]
+    
+    def get_by_ids(self, ids: List[str]) -> Dict[str, Document]:
+        """Fetch chunks by id"""
+        results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(page_content=text, metadata={**(metadata or {}), "_id": chunk_id})
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+    
+    def get_document_chunks(self, document_id: str) -> List[Tuple[str, str, Dict]]:
+        """Fetch (id, text, metadata) of every chunk of a document"""
+        results = self.collection.get(where={"document_id": document_id}, include=["documents", "metadatas"])
+        return [
+            (chunk_id, text, metadata or {})
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+    
+    def delete_by_ids(self, ids: List[str], batch_size: int = 500):
+        """Delete chunks by id"""
+        try:
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                self.collection.delete(ids=batch)
+                self.keyword_index.delete_chunks(batch)
+                if self.vector_index is not None:
+                    self.vector_index.delete_ids(batch)
+        except Exception as e:
+            logger.error(f"Error deleting chunks: {str(e)}")
+            raise
+    
+    def rebuild_keyword_index(self, batch_size: int = 1000):
+        """Rebuild the keyword index from the chunks stored in Chroma"""
+        offset = 0
+        while True:
+            results = self.collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not results["ids"]:
+                break
+            
+            self.keyword_index.add(
+                results["ids"],
+                results["documents"],
+                [(metadata or {}).get("document_id", "") for metadata in results["metadatas"]]
+            )
+            offset += len(results["ids"])
+            
+        self.keyword_index.save()
+        logger.info(f"Keyword index rebuilt: {offset} chunks")
+    
+    def rebuild_vector_index(self, batch_size: int = 1000):
+        """Rebuild the flat vector index from the embeddings stored in Chroma"""
+        self.vector_index.reset()
+        offset = 0
+        while True:
+            results = self.collection.get(limit=batch_size, offset=offset, include=["embeddings", "metadatas"])
+            if not results["ids"]:
+                break
+            
+            self.vector_index.add(
+                results["ids"],
+                results["embeddings"],
+                [(metadata or {}).get("document_id", "") for metadata in results["metadatas"]]
+            )
+            offset += len(results["ids"])
+        
+        # Pages follow Chroma's order, so group each document into one range
+        self.vector_index.compact()
+        self.vector_index.save()
+        logger.info(f"Vector index rebuilt: {offset} chunks")
+    
+    def compact_vector_index(self) -> bool:
+        """Reclaim tombstoned rows of the flat index; False if there was nothing to do or it is disabled"""
+        if self.vector_index is None:
+            return False
+        return self.vector_index.compact()
+    
     def delete_by_document_id(self,document_id:str):
         """Delete all chuck for a document"""
+        self.delete_by_document_ids([document_id])
+    
+    def delete_by_document_ids(self, document_ids: List[str], batch_size: int = 500,
+                               progress: Optional[Callable[[int], None]] = None):
+        """Delete all chunks of many documents, one filtered delete per batch of documents"""
         try:
-            results = self.collection.get(where={"document_id": document_id})
-            if results['ids']:
-                self.collection.delete(ids=results['ids'])
-                logger.info(f"Deleted {len(results['ids'])} chunks for document {document_id}")
+            for start in range(0, len(document_ids), batch_size):
+                batch = document_ids[start:start + batch_size]
+                # Deleting by filter avoids listing the chunk ids first
+                self.collection.delete(where=document_filter(batch))
+                self.keyword_index.delete_documents(batch)
+                if self.vector_index is not None:
+                    self.vector_index.delete_documents(batch)
+                if progress is not None:
+                    progress(start + len(batch))
+                    
+            logger.info(f"Deleted chunks for {len(document_ids)} documents")
         except Exception as e:
             logger.error(f"Error deleting document: {str(e)}")
             raise
     
+    def list_document_ids(self, batch_size: int = 5000) -> Set[str]:
+        """Collect the ids of all documents with chunks in the collection"""
+        document_ids = set()
+        offset = 0
+        while True:
+            results = self.collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+            if not results["ids"]:
+                break
+            
+            document_ids.update((metadata or {}).get("document_id", "") for metadata in results["metadatas"])
+            offset += len(results["ids"])
+            
+        document_ids.discard("")
+        return document_ids
+    
     def get_stats(self)-> Dict:
         """Get collection statistics"""
         count = self.collection.count()
         return {
             "collection_name" : settings.CHROMA_COLLECTION_NAME,
             "total_documents": count,
-            "persist_directory" : settings.CHROMA_PERSIST_DIR
+            "persist_directory" : settings.CHROMA_PERSIST_DIR,
+            "embedding_model" : self.embedding_model,
+            "embedding_dimension" : self.embedding_dimension,
+            "embedding_cache" : self.embedding_cache.get_stats() if self.embedding_cache else None,
+            "vector_index" : self.vector_index.get_stats() if self.vector_index is not None else {"backend": "chroma"}
         }
 
 
-vector_store = VectorStoreClient()
\ No newline at end of file
+def document_filter(document_ids: Optional[List[str]]) -> Optional[Dict]:
+    """Build a Chroma metadata filter restricting results to documents"""
+    if not document_ids:
+        return None
+    return {"document_id": {"$in": document_ids}}
+
+
+def create_vector_store():
+    """Open the index in this process, or connect to the vector search service (VECTOR_STORE_MODE=remote)"""
+    mode = settings.VECTOR_STORE_MODE.lower()
+    if mode == "local":
+        return VectorStoreClient()
+    if mode == "remote":
+        from src.vector_store.remote import RemoteVectorStore
+        
+        return RemoteVectorStore(settings.VECTOR_SERVICE_SOCKET, timeout=settings.VECTOR_SERVICE_TIMEOUT)
+    
+    raise ValueError(f"Unsupported vector store mode: {mode}")
+
+
+vector_store = create_vector_store()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import hashlib
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.core.config import Settings
+from src.vector_store.bm25 import tokenize
+
+# Output sizes of known OpenAI embedding models
+OPENAI_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+class LocalEmbeddings(Embeddings):
+    """Abstract base class for CPU embedders: splits input into batches run on a thread pool"""
+
+    dimension: int
+
+    def __init__(self, batch_size: int, workers: int):
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-embedding")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0]).tolist()
+
+        vectors = []
+        for batch_vectors in self._executor.map(self._embed_batch, batches):
+            vectors.extend(batch_vectors.tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
+
+    @abstractmethod
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch into a (len(texts), dimension) float32 array"""
+
+
+class HashingEmbeddings(LocalEmbeddings):
+    """Deterministic feature-hashing embedder (unigrams and bigrams), mainly for tests and offline use"""
+
+    def __init__(self, dimension: int = 384, batch_size: int = 256, workers: int = 1):
+        super().__init__(batch_size=batch_size, workers=workers)
+        self.dimension = dimension
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            terms = tokenize(text)
+            features = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+            for feature in features:
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                sign = 1.0 if digest >> 63 else -1.0
+                vectors[row, digest % self.dimension] += sign
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class OnnxEmbeddings(LocalEmbeddings):
+    """all-MiniLM-L6-v2 on onnxruntime (the model bundled with chromadb)
+
+    The model is downloaded on first use unless it is already present in
+    model_dir, so air-gapped hosts need the files provisioned there.
+    """
+
+    dimension = 384
+
+    def __init__(self, batch_size: int = 64, workers: int = 4, model_dir: Optional[str] = None):
+        super().__init__(batch_size=batch_size, workers=workers)
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+        self._model = ONNXMiniLM_L6_V2()
+        if model_dir:
+            self._model.DOWNLOAD_PATH = model_dir
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._model(texts), dtype=np.float32)
+
+
+def create_embeddings(settings: Settings) -> Tuple[Embeddings, str, Optional[int]]:
+    """Build the configured embedding backend
+
+    Returns (embeddings, model identity, dimension). The identity names the
+    vector space: caches and collections built by one backend must not be
+    mixed with another.
+    """
+    backend = settings.EMBEDDING_BACKEND
+
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        embeddings = OpenAIEmbeddings(
+            model=settings.OPENAI_EMBEDDING_MODEL,
+            openai_api_key = settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            # Compatible servers expect raw text rather than tiktoken token arrays
+            check_embedding_ctx_length=settings.OPENAI_BASE_URL is None
+        )
+        dimension = settings.EMBEDDING_DIMENSION or OPENAI_DIMENSIONS.get(settings.OPENAI_EMBEDDING_MODEL)
+        return embeddings, settings.OPENAI_EMBEDDING_MODEL, dimension
+
+    if backend == "onnx":
+        embeddings = OnnxEmbeddings(
+            batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE,
+            workers=settings.EMBEDDING_WORKERS,
+            model_dir=settings.ONNX_MODEL_DIR
+        )
+        return embeddings, "onnx-all-MiniLM-L6-v2", embeddings.dimension
+
+    if backend == "hashing":
+        embeddings = HashingEmbeddings(
+            dimension=settings.EMBEDDING_DIMENSION or 384,
+            batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE,
+            workers=settings.EMBEDDING_WORKERS
+        )
+        return embeddings, f"hashing-{embeddings.dimension}", embeddings.dimension
+
+    raise ValueError(f"Unsupported embedding backend: {backend}")
@@ -0,0 +1,467 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Imported standalone by the benchmarks, so use the logger directly
+logger = logging.getLogger("document-qa")
+
+INDEX_FILE = "index.json"
+MIN_CAPACITY = 1024
+
+QUANTIZATIONS = ("none", "float16", "int8")
+FILE_SUFFIXES = {np.dtype(np.float32): "f32", np.dtype(np.float16): "f16", np.dtype(np.int8): "i8"}
+
+
+class FlatIndex:
+    """Exact nearest-neighbour index over a memory-mapped float32 matrix
+
+    Rows are appended to the end of the matrix and a document's rows are kept
+    in a few contiguous ranges, so a document filter scores only those rows
+    instead of the whole collection. Deleted rows are tombstoned; `compact`
+    rewrites the live rows document by document, leaving each document as a
+    single range. Distances are squared L2, the same as Chroma's default space.
+
+    With `quantization` set to float16 or int8, the first pass scans compact
+    codes instead (int8 codes carry a per-row scale), and only the best
+    `k * rescore_multiplier` candidates are rescored against the float32 rows,
+    which then stay on disk and are paged in for those few rows only.
+
+    Each column (vectors, squared norms, codes, scales) is a file named
+    `<column>-<generation>.<type>`; `index.json` holds the row ids and
+    document ranges and is the commit point, so rows written after the last
+    save are simply not part of the index after a crash.
+    """
+
+    def __init__(self, directory: str, dimension: Optional[int] = None, compact_ratio: float = 0.2,
+                 save_interval: float = 5.0, block_rows: int = 8192, quantization: str = "none",
+                 rescore_multiplier: int = 4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+
+        self.directory = directory
+        self.dimension = dimension
+        self.compact_ratio = compact_ratio
+        self.save_interval = save_interval
+        self.block_rows = block_rows
+        self.quantization = quantization
+        self.rescore_multiplier = max(1, rescore_multiplier)
+
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._count = 0
+        self._deleted = 0
+        self._ids: List[Optional[str]] = []  # row -> chunk id, None once tombstoned
+        self._rows: Dict[str, int] = {}
+        self._ranges: Dict[str, List[List[int]]] = {}  # document id -> [start, end) row ranges
+        self._columns: Dict[str, np.memmap] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        return self._count - self._deleted
+
+    def add(self, ids: List[str], embeddings, document_ids: List[str]):
+        """Append vectors (re-adding an id replaces it); each document's rows of a batch stay contiguous"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if not len(ids):
+            return
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError(f"Expected {len(ids)} vectors, got an array of shape {vectors.shape}")
+
+        # An id repeated within the batch keeps its last vector, like an id re-added in a later batch
+        last = {chunk_id: position for position, chunk_id in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids = [ids[position] for position in keep]
+            document_ids = [document_ids[position] for position in keep]
+            vectors = vectors[keep]
+
+        # Group the batch by document, keeping chunk order within each document
+        groups: Dict[str, List[int]] = {}
+        for position, document_id in enumerate(document_ids):
+            groups.setdefault(document_id, []).append(position)
+        order = [position for positions in groups.values() for position in positions]
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Vectors have dimension {vectors.shape[1]}, index expects {self.dimension}")
+
+            self._tombstone([self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows])
+
+            start = self._count
+            end = start + len(ids)
+            self._reserve(end)
+
+            for name, values in self._encode(vectors[order]).items():
+                self._columns[name][start:end] = values
+            self._live[start:end] = True
+
+            for row, position in enumerate(order, start):
+                self._ids.append(ids[position])
+                self._rows[ids[position]] = row
+
+            row = start
+            for document_id, positions in groups.items():
+                self._extend_range(document_id, row, row + len(positions))
+                row += len(positions)
+
+            self._count = end
+            self._mark_dirty()
+
+    def delete_ids(self, ids: Iterable[str]):
+        """Tombstone vectors by chunk id"""
+        with self._lock:
+            self._tombstone([self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows])
+            self._mark_dirty()
+            self._maybe_compact()
+
+    def delete_documents(self, document_ids: Iterable[str]):
+        """Tombstone every vector of the given documents"""
+        with self._lock:
+            for document_id in document_ids:
+                for start, end in self._ranges.pop(document_id, ()):
+                    self._tombstone(start + np.flatnonzero(self._live[start:end]))
+            self._mark_dirty()
+            self._maybe_compact()
+
+    def search(self, embedding: List[float], k: int, document_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Return (chunk_id, squared L2 distance) of the k nearest vectors, closest first"""
+        query = np.asarray(embedding, dtype=np.float32)
+
+        with self._lock:
+            if self._count == 0 or k <= 0:
+                return []
+            if query.shape != (self.dimension,):
+                raise ValueError(f"Query vector has dimension {query.shape[-1]}, index expects {self.dimension}")
+
+            # Scoring runs outside the lock on a snapshot; appends only write past `count`,
+            # and compaction and growth swap in new arrays instead of changing these
+            columns, live, ids = dict(self._columns), self._live, self._ids
+            if document_ids is None:
+                ranges = [(0, self._count)]
+            else:
+                ranges = sorted(
+                    (start, end)
+                    for document_id in set(document_ids)
+                    for start, end in self._ranges.get(document_id, ())
+                )
+
+        quantized = self.quantization != "none"
+        candidates = k * self.rescore_multiplier if quantized else k
+        best_rows = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0, dtype=np.float32)
+
+        for rows in self._blocks(ranges):
+            # |q - x|^2 without the |q|^2 term, which does not change the ranking
+            distances = columns["norms"][rows] - 2.0 * self._dot(columns, rows, query)
+            distances[~live[rows]] = np.inf
+            if isinstance(rows, slice):
+                rows = np.arange(rows.start, rows.stop)
+
+            best_rows = np.concatenate((best_rows, rows))
+            best_distances = np.concatenate((best_distances, distances))
+            if len(best_rows) > candidates:
+                keep = np.argpartition(best_distances, candidates - 1)[:candidates]
+                best_rows, best_distances = best_rows[keep], best_distances[keep]
+
+        if quantized and len(best_rows):
+            # Exact distances for the candidates; sorted rows keep the reads in file order
+            best_rows = np.sort(best_rows[np.isfinite(best_distances)])
+            best_distances = columns["norms"][best_rows] - 2.0 * (columns["vectors"][best_rows] @ query)
+
+        query_norm = float(query @ query)
+        results = []
+        for position in np.argsort(best_distances, kind="stable")[:k]:
+            distance = best_distances[position]
+            chunk_id = ids[best_rows[position]]
+            if np.isinf(distance) or chunk_id is None:
+                continue
+            results.append((chunk_id, max(float(distance) + query_norm, 0.0)))
+        return results
+
+    def compact(self) -> bool:
+        """Drop tombstoned rows and store each document as one range; returns False if there was nothing to do"""
+        with self._lock:
+            fragmented = any(len(ranges) > 1 for ranges in self._ranges.values())
+            if self._deleted == 0 and not fragmented:
+                return False
+
+            generation = self._generation + 1
+            capacity = max(len(self), MIN_CAPACITY)
+            columns = {
+                name: self._open(self._path(name, dtype, generation), dtype, self._shape(wide, capacity), create=True)
+                for name, dtype, wide in self._column_specs()
+            }
+
+            ids: List[Optional[str]] = []
+            new_ranges: Dict[str, List[List[int]]] = {}
+            row = 0
+            for document_id, document_ranges in self._ranges.items():
+                document_start = row
+                for range_start, range_end in document_ranges:
+                    for start in range(range_start, range_end, self.block_rows):
+                        end = min(range_end, start + self.block_rows)
+                        rows = start + np.flatnonzero(self._live[start:end])
+                        for name, column in columns.items():
+                            column[row:row + len(rows)] = self._columns[name][rows]
+                        ids.extend(self._ids[r] for r in rows)
+                        row += len(rows)
+                if row > document_start:
+                    new_ranges[document_id] = [[document_start, row]]
+
+            for column in columns.values():
+                column.flush()
+
+            previous = self._generation
+            self._generation = generation
+            self._columns = columns
+            self._live = np.zeros(capacity, dtype=bool)
+            self._live[:row] = True
+            self._ids = ids
+            self._rows = {chunk_id: r for r, chunk_id in enumerate(ids)}
+            self._ranges = new_ranges
+            self._count = row
+            self._deleted = 0
+
+            self._dirty = True
+            self.save()
+            self._remove_generation(previous)
+
+        logger.info(f"Vector index compacted: {row} rows in {len(new_ranges)} documents")
+        return True
+
+    def reset(self):
+        """Remove every vector, e.g. before a rebuild"""
+        with self._lock:
+            self._count = self._deleted = 0
+            self._ids, self._rows, self._ranges = [], {}, {}
+            self._live[:] = False
+            self._mark_dirty()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "flat",
+                "quantization": self.quantization,
+                "rescore_multiplier": self.rescore_multiplier if self.quantization != "none" else None,
+                "vectors": len(self),
+                "tombstones": self._deleted,
+                "documents": len(self._ranges),
+                "fragmented_documents": sum(1 for ranges in self._ranges.values() if len(ranges) > 1),
+                "dimension": self.dimension,
+                "capacity": len(self._live),
+                "scan_bytes_per_vector": self.scan_bytes_per_vector()
+            }
+
+    def scan_bytes_per_vector(self) -> Optional[int]:
+        """Bytes per row read by the first pass, i.e. what has to stay in memory for fast scans"""
+        if self.dimension is None:
+            return None
+        return sum(
+            np.dtype(dtype).itemsize * (self.dimension if wide else 1)
+            for name, dtype, wide in self._column_specs()
+            if name != "vectors" or self.quantization == "none"
+        )
+
+    def save(self):
+        """Flush the columns, then write the row ids and ranges atomically"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+
+            for column in self._columns.values():
+                column.flush()
+
+            data = {
+                "generation": self._generation,
+                "dimension": self.dimension,
+                "quantization": self.quantization,
+                "count": self._count,
+                "ids": self._ids[:self._count],
+                "ranges": self._ranges
+            }
+            self._dirty = False
+
+            index_path = os.path.join(self.directory, INDEX_FILE)
+            tmp_path = f"{index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, index_path)
+
+    def _load(self):
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            generation = data["generation"]
+            dimension = data["dimension"]
+            count = data["count"]
+            if dimension is None or count == 0:
+                self._generation = generation
+                return
+
+            if self.dimension is not None and dimension != self.dimension:
+                raise ValueError(f"Index was built with dimension {dimension}, expected {self.dimension}")
+            built_with = data.get("quantization", "none")
+            if built_with != self.quantization:
+                raise ValueError(f"Index was built with {built_with} quantization, configured {self.quantization}")
+
+            vectors_path = self._path("vectors", np.float32, generation)
+            capacity = os.path.getsize(vectors_path) // (dimension * 4)
+            if capacity < count:
+                raise ValueError(f"{vectors_path} holds {capacity} rows, index expects {count}")
+
+            self.dimension = dimension
+            columns = {
+                name: self._open(self._path(name, dtype, generation), dtype, self._shape(wide, capacity))
+                for name, dtype, wide in self._column_specs()
+            }
+
+        except (OSError, ValueError, KeyError) as e:
+            # The client rebuilds from Chroma when the index comes up empty
+            logger.error(f"Could not load vector index, starting empty: {str(e)}")
+            return
+
+        self._generation = generation
+        self._columns = columns
+        self._count = count
+        self._ids = data["ids"]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids) if chunk_id is not None}
+        self._ranges = data["ranges"]
+        self._deleted = count - len(self._rows)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._live[:count] = [chunk_id is not None for chunk_id in self._ids]
+        logger.info(f"Vector index loaded: {len(self)} vectors, {self._deleted} tombstones")
+
+    def _column_specs(self) -> List[Tuple[str, type, bool]]:
+        """(name, dtype, one value per dimension) of each stored column"""
+        specs = [("vectors", np.float32, True), ("norms", np.float32, False)]
+        if self.quantization == "float16":
+            specs.append(("codes", np.float16, True))
+        elif self.quantization == "int8":
+            specs += [("codes", np.int8, True), ("scales", np.float32, False)]
+        return specs
+
+    def _encode(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        """Column values for new rows"""
+        values = {"vectors": vectors, "norms": np.einsum("ij,ij->i", vectors, vectors)}
+        if self.quantization == "float16":
+            values["codes"] = vectors.astype(np.float16)
+        elif self.quantization == "int8":
+            # Symmetric per-row scale: needs no training data and suits unit-length embeddings
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            values["codes"] = np.rint(vectors / scales[:, None]).astype(np.int8)
+            values["scales"] = scales.astype(np.float32)
+        return values
+
+    def _dot(self, columns: Dict[str, np.ndarray], rows, query: np.ndarray) -> np.ndarray:
+        """Inner products of the query with a block of rows, approximate when quantized"""
+        if self.quantization == "none":
+            return columns["vectors"][rows] @ query
+        products = columns["codes"][rows].astype(np.float32) @ query
+        if self.quantization == "int8":
+            products *= columns["scales"][rows]
+        return products
+
+    def _reserve(self, rows: int):
+        """Grow the memory-mapped files to hold at least `rows` rows"""
+        capacity = len(self._live)
+        if self._columns and rows <= capacity:
+            return
+
+        capacity = max(rows, 2 * capacity, MIN_CAPACITY)
+        for column in self._columns.values():
+            column.flush()
+
+        # Growing the files in place keeps the old mappings valid for searches still using them
+        self._columns = {
+            name: self._open(self._path(name, dtype, self._generation), dtype, self._shape(wide, capacity), create=True)
+            for name, dtype, wide in self._column_specs()
+        }
+
+        live = np.zeros(capacity, dtype=bool)
+        live[:self._count] = self._live[:self._count]
+        self._live = live
+
+    def _shape(self, wide: bool, capacity: int) -> Tuple[int, ...]:
+        return (capacity, self.dimension) if wide else (capacity,)
+
+    def _open(self, path: str, dtype, shape: Tuple[int, ...], create: bool = False) -> np.memmap:
+        if create:
+            with open(path, "ab") as f:
+                f.truncate(max(os.path.getsize(path), int(np.prod(shape)) * np.dtype(dtype).itemsize))
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _path(self, name: str, dtype, generation: int) -> str:
+        return os.path.join(self.directory, f"{name}-{generation}.{FILE_SUFFIXES[np.dtype(dtype)]}")
+
+    def _remove_generation(self, generation: int):
+        for name, dtype, _ in self._column_specs():
+            path = self._path(name, dtype, generation)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _blocks(self, ranges: List[Tuple[int, int]]) -> Iterator:
+        """Split row ranges into blocks of about `block_rows`: slices of long ranges are read
+        in place, short ranges (small documents) are gathered together into one row array"""
+        pending: List[np.ndarray] = []
+        pending_rows = 0
+        for range_start, range_end in ranges:
+            if range_end - range_start >= self.block_rows:
+                for start in range(range_start, range_end, self.block_rows):
+                    yield slice(start, min(range_end, start + self.block_rows))
+                continue
+
+            pending.append(np.arange(range_start, range_end))
+            pending_rows += range_end - range_start
+            if pending_rows >= self.block_rows:
+                yield np.concatenate(pending)
+                pending, pending_rows = [], 0
+
+        if pending:
+            yield np.concatenate(pending)
+
+    def _tombstone(self, rows: Iterable[int]):
+        for row in rows:
+            if self._live[row]:
+                self._live[row] = False
+                del self._rows[self._ids[row]]
+                self._ids[row] = None
+                self._deleted += 1
+
+    def _extend_range(self, document_id: str, start: int, end: int):
+        ranges = self._ranges.setdefault(document_id, [])
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+
+    def _maybe_compact(self):
+        if self._deleted and self._deleted >= self.compact_ratio * self._count:
+            self.compact()
+
+    def _mark_dirty(self):
+        # Saves are debounced so streaming ingestion does not rewrite the id list per batch
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_interval, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
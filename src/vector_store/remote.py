@@ -0,0 +1,256 @@
+import base64
+import json
+import socket
+import struct
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.vector_store.client import EmbeddingClient
+from src.core.logging import logger
+
+# Frames are a 4-byte big-endian length followed by a JSON message
+HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 512 * 1024 * 1024
+
+
+class VectorServiceError(RuntimeError):
+    """Raised when the vector search service fails a request"""
+
+
+def encode_frame(message: Dict) -> bytes:
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+
+def decode_body(body: bytes) -> Dict:
+    return json.loads(body)
+
+
+def read_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Vector search service closed the connection")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def read_frame(sock: socket.socket) -> Dict:
+    (size,) = HEADER.unpack(read_exactly(sock, HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise VectorServiceError(f"Frame of {size} bytes exceeds the limit")
+    return decode_body(read_exactly(sock, size))
+
+
+def encode_vectors(vectors) -> List:
+    """Pack vectors as base64 float32, far smaller and faster to parse than JSON numbers"""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return [matrix.shape[0], matrix.shape[1], base64.b64encode(matrix.tobytes()).decode("ascii")]
+
+
+def decode_vectors(payload: List) -> np.ndarray:
+    rows, dimension, data = payload
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(rows, dimension)
+
+
+def encode_hits(hits: List[Tuple[Document, float]]) -> List:
+    return [[doc.page_content, doc.metadata, float(score)] for doc, score in hits]
+
+
+def decode_hits(payload: List) -> List[Tuple[Document, float]]:
+    return [(Document(page_content=text, metadata=metadata), score) for text, metadata, score in payload]
+
+
+class RemoteKeywordIndex:
+    """The parts of the keyword index API workers use, forwarded to the vector search service"""
+
+    def __init__(self, store: "RemoteVectorStore"):
+        self.store = store
+
+    def save(self):
+        self.store.call("keyword_save")
+
+    def document_ids(self) -> Set[str]:
+        return set(self.store.call("keyword_document_ids"))
+
+    def delete_documents(self, document_ids: List[str]):
+        self.store.call("keyword_delete_documents", document_ids=list(document_ids))
+
+
+class RemoteVectorStore(EmbeddingClient):
+    """VectorStoreClient interface backed by the vector search service (python -m src.vector_store.server)
+
+    Texts are embedded in this process, so the embedding cache and API keys
+    stay with the API workers; the service owns Chroma, the keyword index
+    and the flat index. Every thread keeps its own connection, and a request
+    that hits a dropped connection (e.g. a service restart) is retried once
+    on a new one.
+    """
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__()
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.keyword_index = RemoteKeywordIndex(self)
+        self._local = threading.local()
+        logger.info(f"Vector store connected to the vector search service at {socket_path}")
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            return sock
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+            sock.sendall(encode_frame({"op": "describe", "args": {}}))
+            service = read_frame(sock)["result"]
+        except Exception:
+            sock.close()
+            raise
+
+        if service["embedding_model"] != self.embedding_model:
+            sock.close()
+            raise ValueError(
+                f"Vector search service indexes {service['embedding_model']} embeddings, "
+                f"but this worker is configured for {self.embedding_model}"
+            )
+
+        self._local.sock = sock
+        return sock
+
+    def _drop_connection(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def call(self, op: str, **args):
+        """Run an operation on the service and return its result"""
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(encode_frame({"op": op, "args": args}))
+                response = read_frame(sock)
+                break
+            except socket.timeout:
+                # The request may still be running, so it is not sent again
+                self._drop_connection()
+                raise
+            except (ConnectionError, FileNotFoundError):
+                self._drop_connection()
+                if attempt:
+                    raise
+
+        if "error" in response:
+            error_type = ValueError if response.get("type") == "ValueError" else VectorServiceError
+            raise error_type(response["error"])
+        return response.get("result")
+
+    def add_documents(self, texts: List[str], metadatas: List[Dict], ids: Optional[List[str]] = None) -> List[str]:
+        """Add documents to vector store"""
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        return self.add_embeddings(texts, self.embed_documents(texts), metadatas, ids)
+
+    def search_similar(self, query: str, k: int = 3, filter_dict: Optional[Dict] = None):
+        """Search for similarity documents"""
+        try:
+            return self.search_by_vector(self.embed_query(query), k=k, filter_dict=filter_dict)
+        except Exception as e:
+            logger.error(f"Error searching: {str(e)}")
+
+    def add_embeddings(self, texts: List[str], embeddings: List[List[float]], metadatas: List[Dict], ids: List[str]) -> List[str]:
+        """Write precomputed embeddings; existing ids are overwritten"""
+        self.call(
+            "add_embeddings", texts=texts, embeddings=encode_vectors(embeddings), metadatas=metadatas, ids=ids
+        )
+        return ids
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict], batch_size: int = 500):
+        """Replace chunk metadata in place without re-embedding"""
+        self.call("update_metadatas", ids=ids, metadatas=metadatas, batch_size=batch_size)
+
+    def search_by_vector(self, embedding: List[float], k: int = 3, filter_dict: Optional[Dict] = None,
+                         document_ids: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """Search with a precomputed query vector; the service batches it with concurrent queries"""
+        return decode_hits(self.call(
+            "search_by_vector", embedding=encode_vectors(embedding), k=k, filter_dict=filter_dict,
+            document_ids=document_ids
+        ))
+
+    def search_by_vectors(self, embeddings: List[List[float]], k: int = 3,
+                          document_ids: Optional[List[str]] = None) -> List[List[Tuple[Document, float]]]:
+        """Search with many query vectors at once"""
+        if not embeddings:
+            return []
+        results = self.call("search_by_vectors", embeddings=encode_vectors(embeddings), k=k, document_ids=document_ids)
+        return [decode_hits(hits) for hits in results]
+
+    def keyword_search(self, query: str, k: int = 3, document_ids: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """BM25 search over chunk text; scores are BM25 (higher is better)"""
+        return decode_hits(self.call("keyword_search", query=query, k=k, document_ids=document_ids))
+
+    def hybrid_search(self, query: str, embedding: List[float], k: int = 3,
+                      document_ids: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """Fuse dense and BM25 rankings with reciprocal rank fusion; scores are RRF (higher is better)"""
+        return decode_hits(self.call(
+            "hybrid_search", query=query, embedding=encode_vectors(embedding), k=k, document_ids=document_ids
+        ))
+
+    def get_by_ids(self, ids: List[str]) -> Dict[str, Document]:
+        """Fetch chunks by id"""
+        results = self.call("get_by_ids", ids=ids)
+        return {chunk_id: Document(page_content=text, metadata=metadata) for chunk_id, text, metadata in results}
+
+    def get_document_chunks(self, document_id: str) -> List[Tuple[str, str, Dict]]:
+        """Fetch (id, text, metadata) of every chunk of a document"""
+        return [tuple(chunk) for chunk in self.call("get_document_chunks", document_id=document_id)]
+
+    def delete_by_ids(self, ids: List[str], batch_size: int = 500):
+        """Delete chunks by id"""
+        self.call("delete_by_ids", ids=ids, batch_size=batch_size)
+
+    def rebuild_keyword_index(self, batch_size: int = 1000):
+        """Rebuild the keyword index from the chunks stored in Chroma"""
+        self.call("rebuild_keyword_index", batch_size=batch_size)
+
+    def rebuild_vector_index(self, batch_size: int = 1000):
+        """Rebuild the flat vector index from the embeddings stored in Chroma"""
+        self.call("rebuild_vector_index", batch_size=batch_size)
+
+    def compact_vector_index(self) -> bool:
+        """Reclaim tombstoned rows of the flat index; False if there was nothing to do or it is disabled"""
+        return self.call("compact_vector_index")
+
+    def delete_by_document_id(self, document_id: str):
+        """Delete all chuck for a document"""
+        self.delete_by_document_ids([document_id])
+
+    def delete_by_document_ids(self, document_ids: List[str], batch_size: int = 500,
+                               progress: Optional[Callable[[int], None]] = None):
+        """Delete all chunks of many documents, one request per batch so progress can be reported"""
+        for start in range(0, len(document_ids), batch_size):
+            batch = document_ids[start:start + batch_size]
+            self.call("delete_by_document_ids", document_ids=batch, batch_size=batch_size)
+            if progress is not None:
+                progress(start + len(batch))
+
+        logger.info(f"Deleted chunks for {len(document_ids)} documents")
+
+    def list_document_ids(self, batch_size: int = 5000) -> Set[str]:
+        """Collect the ids of all documents with chunks in the collection"""
+        return set(self.call("list_document_ids", batch_size=batch_size))
+
+    def get_stats(self) -> Dict:
+        """Get collection statistics (the embedding cache is this worker's)"""
+        stats = self.call("get_stats")
+        stats["embedding_cache"] = self.embedding_cache.get_stats() if self.embedding_cache else None
+        return stats
@@ -0,0 +1,288 @@
+"""Vector search service: one process owning the vector store, shared by every API worker
+
+Chroma, the keyword index and the flat index are opened here only, so API
+workers (VECTOR_STORE_MODE=remote) neither hold their own copy of the index
+nor write to CHROMA_PERSIST_DIR concurrently. Requests arrive over a Unix
+socket; dense queries from all connections are micro-batched into one
+search per VECTOR_SERVICE_BATCH_WINDOW:
+
+    python -m src.vector_store.server
+    VECTOR_STORE_MODE=remote uvicorn src.main:app --workers 8
+"""
+import os
+
+# This process owns the index, so the module-level store must open it rather than connect to itself
+os.environ["VECTOR_STORE_MODE"] = "local"
+
+import asyncio
+import signal
+import socket
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.vector_store.client import VectorStoreClient, vector_store
+from src.vector_store.remote import (
+    HEADER, MAX_FRAME_BYTES, decode_body, decode_vectors, encode_frame, encode_hits
+)
+from src.core.config import get_settings
+from src.core.executor import run_blocking, shutdown_executors
+from src.core.logging import logger, log_error
+
+settings = get_settings()
+
+
+class QueryBatcher:
+    """Collects concurrent dense queries and runs each group as one search_by_vectors call
+
+    Queries are grouped by k and document filter. A group runs once
+    `window` seconds have passed since its first query or it reaches
+    `max_batch` queries, whichever comes first.
+    """
+
+    def __init__(self, store: VectorStoreClient, window: float, max_batch: int):
+        self.store = store
+        self.window = window
+        self.max_batch = max_batch
+        self.queries = 0
+        self.batches = 0
+
+        self._groups: Dict[Tuple, List[Tuple[List[float], asyncio.Future]]] = {}
+        self._timers: Dict[Tuple, asyncio.TimerHandle] = {}
+
+    async def search(self, embedding: List[float], k: int, document_ids: Optional[List[str]]) -> List:
+        loop = asyncio.get_running_loop()
+        key = (k, tuple(sorted(document_ids)) if document_ids else None)
+        future = loop.create_future()
+
+        group = self._groups.setdefault(key, [])
+        group.append((embedding, future))
+        if len(group) >= self.max_batch:
+            self._fire(key)
+        elif len(group) == 1:
+            self._timers[key] = loop.call_later(self.window, self._fire, key)
+
+        return await future
+
+    def _fire(self, key: Tuple):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(key, None)
+        if group:
+            asyncio.create_task(self._run(key, group))
+
+    async def _run(self, key: Tuple, group: List[Tuple[List[float], asyncio.Future]]):
+        k, document_ids = key
+        self.queries += len(group)
+        self.batches += 1
+        try:
+            results = await run_blocking(
+                self.store.search_by_vectors, [embedding for embedding, _ in group], k,
+                list(document_ids) if document_ids else None
+            )
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), hits in zip(group, results):
+            if not future.done():
+                future.set_result(hits)
+
+    def get_stats(self) -> Dict:
+        return {
+            "queries": self.queries,
+            "batches": self.batches,
+            "mean_batch_size": round(self.queries / self.batches, 2) if self.batches else None
+        }
+
+
+class VectorSearchServer:
+    """Serves vector store operations to API workers over a Unix socket"""
+
+    def __init__(self, store: VectorStoreClient, socket_path: str, batch_window: float, max_batch: int):
+        self.store = store
+        self.socket_path = socket_path
+        self.batcher = QueryBatcher(store, window=batch_window, max_batch=max_batch)
+        self.connections = 0
+        self.started_at = time.time()
+        self._handlers: Set[asyncio.Task] = set()
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    async def serve(self, stop: asyncio.Event):
+        self._remove_stale_socket()
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        # Only this user's processes may talk to the index
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"Vector search service listening on {self.socket_path}")
+
+        async with server:
+            await stop.wait()
+            server.close()
+            # Closing the connections ends each handler at its next read instead of cancelling it mid-request
+            for writer in list(self._writers):
+                writer.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.remove(self.socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"A vector search service is already listening on {self.socket_path}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._handlers.add(asyncio.current_task())
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                    if size > MAX_FRAME_BYTES:
+                        raise ValueError(f"Frame of {size} bytes exceeds the limit")
+                    request = decode_body(await reader.readexactly(size))
+                except asyncio.IncompleteReadError:
+                    break
+
+                # Clients wait for each answer, so one request per connection is in flight
+                writer.write(encode_frame(await self._execute(request.get("op"), request.get("args") or {})))
+                await writer.drain()
+
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Dropping vector service connection: {str(e)}")
+        finally:
+            self.connections -= 1
+            self._handlers.discard(asyncio.current_task())
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _execute(self, op: str, args: Dict) -> Dict:
+        try:
+            if op == "search_by_vector" and args.get("filter_dict") is None:
+                embedding = decode_vectors(args["embedding"])[0].tolist()
+                # Checked before batching so one bad query cannot fail the others in its batch
+                self.store._ensure_compatible(embedding)
+                hits = await self.batcher.search(embedding, args.get("k", 3), args.get("document_ids"))
+                return {"result": encode_hits(hits)}
+
+            handler = getattr(self, f"_op_{op}", None) if op else None
+            if handler is None:
+                return {"error": f"Unknown operation: {op}", "type": "ValueError"}
+            return {"result": await run_blocking(handler, **args)}
+
+        except Exception as e:
+            log_error(e, f"vector service {op}")
+            return {"error": str(e), "type": type(e).__name__}
+
+    def _op_describe(self) -> Dict:
+        return {"embedding_model": self.store.embedding_model, "embedding_dimension": self.store.embedding_dimension}
+
+    def _op_add_embeddings(self, texts: List[str], embeddings: List, metadatas: List[Dict], ids: List[str]) -> List[str]:
+        return self.store.add_embeddings(texts, decode_vectors(embeddings).tolist(), metadatas, ids)
+
+    def _op_update_metadatas(self, ids: List[str], metadatas: List[Dict], batch_size: int = 500):
+        self.store.update_metadatas(ids, metadatas, batch_size=batch_size)
+
+    def _op_search_by_vector(self, embedding: List, k: int = 3, filter_dict: Optional[Dict] = None,
+                             document_ids: Optional[List[str]] = None) -> List:
+        hits = self.store.search_by_vector(decode_vectors(embedding)[0].tolist(), k, filter_dict, document_ids)
+        return encode_hits(hits)
+
+    def _op_search_by_vectors(self, embeddings: List, k: int = 3, document_ids: Optional[List[str]] = None) -> List:
+        results = self.store.search_by_vectors(decode_vectors(embeddings).tolist(), k, document_ids)
+        return [encode_hits(hits) for hits in results]
+
+    def _op_keyword_search(self, query: str, k: int = 3, document_ids: Optional[List[str]] = None) -> List:
+        return encode_hits(self.store.keyword_search(query, k, document_ids))
+
+    def _op_hybrid_search(self, query: str, embedding: List, k: int = 3,
+                          document_ids: Optional[List[str]] = None) -> List:
+        return encode_hits(self.store.hybrid_search(query, decode_vectors(embedding)[0].tolist(), k, document_ids))
+
+    def _op_get_by_ids(self, ids: List[str]) -> List:
+        return [[chunk_id, doc.page_content, doc.metadata] for chunk_id, doc in self.store.get_by_ids(ids).items()]
+
+    def _op_get_document_chunks(self, document_id: str) -> List:
+        return [list(chunk) for chunk in self.store.get_document_chunks(document_id)]
+
+    def _op_delete_by_ids(self, ids: List[str], batch_size: int = 500):
+        self.store.delete_by_ids(ids, batch_size=batch_size)
+
+    def _op_delete_by_document_ids(self, document_ids: List[str], batch_size: int = 500):
+        self.store.delete_by_document_ids(document_ids, batch_size=batch_size)
+
+    def _op_rebuild_keyword_index(self, batch_size: int = 1000):
+        self.store.rebuild_keyword_index(batch_size=batch_size)
+
+    def _op_rebuild_vector_index(self, batch_size: int = 1000):
+        if self.store.vector_index is None:
+            raise ValueError("The flat vector index is disabled")
+        self.store.rebuild_vector_index(batch_size=batch_size)
+
+    def _op_compact_vector_index(self) -> bool:
+        return self.store.compact_vector_index()
+
+    def _op_list_document_ids(self, batch_size: int = 5000) -> List[str]:
+        return sorted(self.store.list_document_ids(batch_size=batch_size))
+
+    def _op_keyword_save(self):
+        self.store.keyword_index.save()
+
+    def _op_keyword_document_ids(self) -> List[str]:
+        return sorted(self.store.keyword_index.document_ids())
+
+    def _op_keyword_delete_documents(self, document_ids: List[str]):
+        self.store.keyword_index.delete_documents(document_ids)
+
+    def _op_get_stats(self) -> Dict:
+        stats = self.store.get_stats()
+        stats["vector_service"] = {
+            "socket": self.socket_path,
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "connections": self.connections,
+            **self.batcher.get_stats()
+        }
+        return stats
+
+
+async def run(server: VectorSearchServer):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    try:
+        await server.serve(stop)
+    finally:
+        logger.info("Vector search service stopping, saving indexes")
+        server.store.keyword_index.save()
+        if server.store.vector_index is not None:
+            server.store.vector_index.save()
+        shutdown_executors()
+
+
+def main():
+    server = VectorSearchServer(
+        vector_store,
+        socket_path=settings.VECTOR_SERVICE_SOCKET,
+        batch_window=settings.VECTOR_SERVICE_BATCH_WINDOW,
+        max_batch=settings.VECTOR_SERVICE_MAX_BATCH
+    )
+    asyncio.run(run(server))
+
+
+if __name__ == "__main__":
+    main()
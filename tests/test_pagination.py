@@ -0,0 +1,57 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+
+# Settings are read at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pagination.db')}")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("DEBUG", "False")
+
+from sqlalchemy import select, text
+
+from src.core.pagination import keyset_page, split_page
+from src.database import SessionLocal, engine, init_db
+from src.documents.models import Document
+
+
+def page_through(limit: int):
+    pages = []
+    cursor = None
+    with SessionLocal() as db:
+        while True:
+            rows = db.execute(keyset_page(select(Document), Document.created_at, Document.id, cursor, limit))
+            page, cursor = split_page(list(rows.scalars().all()), limit)
+            pages.append([document.id for document in page])
+            if cursor is None or len(pages) > 10:
+                return pages
+
+
+def test_pages_through_more_rows_than_limit():
+    init_db()
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM documents"))
+        # Rows written by server_default=func.now() before created_at was set in-process
+        for i in range(2):
+            connection.execute(text(
+                "INSERT INTO documents (id, title, file_name, file_path, file_size, page_count, created_at) "
+                f"VALUES ('d{i}', 't', 'f', 'p', 1, 1, '2024-01-01 00:00:0{i}')"
+            ))
+
+    tied = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    with SessionLocal() as db:
+        db.add_all([Document(id="d2", title="t", file_name="f", file_path="p", file_size=1, page_count=1, created_at=tied),
+                    Document(id="d3", title="t", file_name="f", file_path="p", file_size=1, page_count=1, created_at=tied)])
+        db.add_all([Document(id=f"d{i}", title="t", file_name="f", file_path="p", file_size=1, page_count=1)
+                    for i in range(4, 7)])
+        db.commit()
+
+    # Legacy values are normalized on start-up
+    init_db()
+
+    assert page_through(3) == [["d6", "d5", "d4"], ["d3", "d2", "d1"], ["d0"]]
+
+
+def test_split_page_rejects_empty_limit():
+    assert split_page([1, 2], 0) == ([], None)
+    assert split_page([1, 2], -1) == ([], None)